@@ -1,91 +1,151 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from quart import Quart, render_template, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
 import os
-import json
+import asyncio
+import orjson
+from core.uploads import write_upload
 
-app = Flask(__name__)
+app = Quart(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
 # Create uploads folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Store user progress in a simple file-based system
-USER_DATA_FILE = 'user_data.json'
+# Store user progress in a simple file-based system: a small summary file
+# (totals and level) plus an append-only history log per exercise
+USER_DATA_DIR = 'user_data'
+SUMMARY_FILE = os.path.join(USER_DATA_DIR, 'summary.json')
+LEGACY_USER_DATA_FILE = 'user_data.json'
+os.makedirs(USER_DATA_DIR, exist_ok=True)
+
+# Serializes summary read-modify-write cycles between concurrent requests
+user_data_lock = asyncio.Lock()
+
+def history_path(exercise):
+    return os.path.join(USER_DATA_DIR, f"{exercise.replace(' ', '_')}.jsonl")
 
 def load_user_data():
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r') as f:
-            return json.load(f)
+    if os.path.exists(SUMMARY_FILE):
+        with open(SUMMARY_FILE, 'rb') as f:
+            return orjson.loads(f.read())
     return {
         "exercises": {
-            "Squats": {"total_reps": 0, "history": []},
-            "Bicep Curls": {"total_reps": 0, "history": []},
-            "Push-Ups": {"total_reps": 0, "history": []},
-            "Shoulder Press": {"total_reps": 0, "history": []},
-            "Lunges": {"total_reps": 0, "history": []}
+            "Squats": {"total_reps": 0},
+            "Bicep Curls": {"total_reps": 0},
+            "Push-Ups": {"total_reps": 0},
+            "Shoulder Press": {"total_reps": 0},
+            "Lunges": {"total_reps": 0}
         },
         "level": 1,
         "level_progress": 35
     }
 
 def save_user_data(data):
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(data, f)
+    # Write to a temp file and swap it in so a crash never leaves a partial summary
+    tmp_path = SUMMARY_FILE + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(data))
+    os.replace(tmp_path, SUMMARY_FILE)
+
+def append_history(exercise, entry):
+    with open(history_path(exercise), 'ab') as f:
+        f.write(orjson.dumps(entry) + b'\n')
+
+def migrate_legacy_user_data():
+    """
+    Split the old single-file user_data.json into the summary and per-exercise
+    history logs, then rename it so the migration runs only once.
+    """
+    if os.path.exists(SUMMARY_FILE) or not os.path.exists(LEGACY_USER_DATA_FILE):
+        return
+    with open(LEGACY_USER_DATA_FILE, 'rb') as f:
+        data = orjson.loads(f.read())
+    for exercise, stats in data.get("exercises", {}).items():
+        history = stats.pop("history", [])
+        # Overwrite rather than append, so an interrupted migration can simply be rerun
+        with open(history_path(exercise), 'wb') as f:
+            f.writelines(orjson.dumps(entry) + b'\n' for entry in history)
+    save_user_data(data)
+    os.replace(LEGACY_USER_DATA_FILE, LEGACY_USER_DATA_FILE + '.migrated')
+    print(f"Migrated {LEGACY_USER_DATA_FILE} to {USER_DATA_DIR}/")
+
+migrate_legacy_user_data()
+
+def load_history(exercise):
+    path = history_path(exercise)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        return [orjson.loads(line) for line in f if line.strip()]
 
 @app.route('/')
-def index():
-    user_data = load_user_data()
-    return render_template('index.html', user_data=user_data)
+async def index():
+    user_data = await asyncio.to_thread(load_user_data)
+    return await render_template('index.html', user_data=user_data)
 
 @app.route('/static/<path:filename>')
-def serve_static(filename):
-    return send_from_directory('static', filename)
+async def serve_static(filename):
+    return await send_from_directory('static', filename)
 
 @app.route('/api/save_workout', methods=['POST'])
-def save_workout():
-    data = request.json
-    user_data = load_user_data()
+async def save_workout():
+    data = await request.get_json()
     
     exercise = data.get('exercise')
     reps = data.get('reps', 0)
     duration = data.get('duration', 0)
     calories = data.get('calories', 0)
     
-    if exercise in user_data["exercises"]:
-        user_data["exercises"][exercise]["total_reps"] += reps
-        user_data["exercises"][exercise]["history"].append({
-            "date": data.get('date'),
-            "reps": reps,
-            "duration": duration,
-            "calories": calories
-        })
+    async with user_data_lock:
+        user_data = await asyncio.to_thread(load_user_data)
         
-        # Update level progress
-        user_data["level_progress"] += reps / 5
-        if user_data["level_progress"] >= 100:
-            user_data["level"] += 1
-            user_data["level_progress"] = user_data["level_progress"] - 100
-    
-    save_user_data(user_data)
+        if exercise in user_data["exercises"]:
+            user_data["exercises"][exercise]["total_reps"] += reps
+            await asyncio.to_thread(append_history, exercise, {
+                "date": data.get('date'),
+                "reps": reps,
+                "duration": duration,
+                "calories": calories
+            })
+            
+            # Update level progress
+            user_data["level_progress"] += reps / 5
+            if user_data["level_progress"] >= 100:
+                user_data["level"] += 1
+                user_data["level_progress"] = user_data["level_progress"] - 100
+        
+        await asyncio.to_thread(save_user_data, user_data)
     return jsonify({"success": True, "user_data": user_data})
 
+@app.route('/api/history/<exercise>', methods=['GET'])
+async def get_history(exercise):
+    user_data = await asyncio.to_thread(load_user_data)
+    if exercise not in user_data["exercises"]:
+        return jsonify({"error": "Exercise not found"}), 404
+    history = await asyncio.to_thread(load_history, exercise)
+    return jsonify({"exercise": exercise, "history": history})
+
 @app.route('/api/upload_video', methods=['POST'])
-def upload_video():
-    if 'video' not in request.files:
+async def upload_video():
+    files = await request.files
+    if 'video' not in files:
         return jsonify({"error": "No video file provided"}), 400
         
-    file = request.files['video']
+    file = files['video']
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
         
     if file:
         filename = secure_filename(file.filename)
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        await asyncio.to_thread(write_upload, file, file_path)
         return jsonify({"success": True, "filename": filename, "path": file_path})
     
     return jsonify({"error": "Upload failed"}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Serve through Uvicorn so concurrent requests share one event loop
+    # (for production: uvicorn app.app:app --workers N)
+    import uvicorn
+    uvicorn.run(app, host='127.0.0.1', port=5000)
\ No newline at end of file
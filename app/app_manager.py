@@ -1,12 +1,17 @@
 # app/app_manager.py
 import os
+import sys
 import time
-import cv2
+import queue
+import threading
 import numpy as np
 import base64
-import json
+import orjson
+import msgpack
 from datetime import datetime
 from core.text_to_speech_manager import TextToSpeechManager
+from core.video_writer import open_video_writer
+from core.rep_times import rep_time_histogram, merge_histograms
 from exercises.squats import SquatTracker
 from exercises.bicep_curls import BicepCurlTracker
 from exercises.pushups import PushUpTracker
@@ -30,36 +35,103 @@ class AppManager:
         self.session_results = {"rep_times": [], "rep_count": 0, "feedback_history": []}
         
         # Load user profile if exists, otherwise create new one
-        self.profile_path = 'user_profile.json'
-        if os.path.exists(self.profile_path):
-            with open(self.profile_path, 'r') as f:
-                self.profile = json.load(f)
-        else:
-            self.profile = {
-                "Squats": {"latest_reps": 0, "progress": []},
-                "Bicep Curls": {"latest_reps": 0, "progress": []},
-                "Push-Ups": {"latest_reps": 0, "progress": []},
-                "Shoulder Press": {"latest_reps": 0, "progress": []},
-                "Lunges": {"latest_reps": 0, "progress": []}
-            }
+        self.profile_path = 'user_profile.msgpack'
+        self.legacy_profile_path = 'user_profile.json'
+        self.max_progress_entries = 100  # Older sessions are folded into progress_stats
+        self.profile = self.load_profile()
         
-        self.video_frames = []  # For storing frames
         self.previous_feedback = ""
         self.last_spoken_time = 0
         self.recording = False
         self.video_writer = None
+        self.video_path = None
+        self.frame_buffer = None  # Preallocated ring of frame slots shared with the writer thread
+        self.free_slots = None    # Slot indices ready to be filled
+        self.frame_queue = None   # Slot indices waiting to be encoded
+        self.writer_thread = None
+        # Guards starting and stopping the writer against frames still in flight
+        self.video_lock = threading.Lock()
+        self.buffer_slots = 32
+        self.slot_timeout = 1.0  # Seconds to wait for a free slot before dropping the frame
         self.frame_count = 0
-        self.max_frames = 3000  # Limit frames to prevent memory issues (~2 minutes at 25fps)
+        self.max_frames = 3000  # Limit recording length (~2 minutes at 25fps)
+
+    def load_profile(self):
+        """Load the msgpack profile, migrating the old JSON profile on first run."""
+        if os.path.exists(self.profile_path):
+            with open(self.profile_path, 'rb') as f:
+                return msgpack.unpackb(f.read(), raw=False)
+                
+        if os.path.exists(self.legacy_profile_path):
+            with open(self.legacy_profile_path, 'rb') as f:
+                self.profile = orjson.loads(f.read())
+            self.save_profile()
+            print(f"Migrated {self.legacy_profile_path} to {self.profile_path}")
+            return self.profile
+            
+        return {
+            "Squats": {"latest_reps": 0, "progress": []},
+            "Bicep Curls": {"latest_reps": 0, "progress": []},
+            "Push-Ups": {"latest_reps": 0, "progress": []},
+            "Shoulder Press": {"latest_reps": 0, "progress": []},
+            "Lunges": {"latest_reps": 0, "progress": []}
+        }
+        
+    def save_profile(self):
+        """Write the profile to disk in msgpack format."""
+        # Write the whole profile in one buffered write to a temp file, then
+        # swap it in so a crash mid-write never leaves a truncated profile
+        tmp_path = self.profile_path + '.tmp'
+        with open(tmp_path, 'wb', buffering=1 << 20) as f:
+            f.write(msgpack.packb(self.profile, use_bin_type=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.profile_path)
 
     def get_profile(self):
         return self.profile
 
+    def add_workout(self, exercise, workout_data):
+        """
+        Append a workout to the exercise's progress list.
+        Only the most recent max_progress_entries sessions are kept verbatim;
+        older ones are folded into a running progress_stats aggregate so the
+        profile stays the same size however many sessions are recorded. Their
+        rep times are kept as a rep_time_histogram in progress_stats["rep_time_counts"].
+        """
+        exercise_data = self.profile[exercise]
+        progress = exercise_data["progress"]
+        progress.append(workout_data)
+        
+        overflow = len(progress) - self.max_progress_entries
+        if overflow <= 0:
+            return
+            
+        stats = exercise_data.setdefault("progress_stats", {
+            "sessions": 0, "total_reps": 0, "total_duration": 0,
+            "total_rep_time": 0, "best_reps": 0, "best_date": None
+        })
+        folded_rep_times = []
+        for old in progress[:overflow]:
+            folded_rep_times.extend(old.get("rep_times", []))
+            stats["sessions"] += 1
+            stats["total_reps"] += old.get("reps", 0)
+            stats["total_duration"] += old.get("duration", 0)
+            stats["total_rep_time"] += sum(old.get("rep_times", []))
+            if old.get("reps", 0) > stats["best_reps"]:
+                stats["best_reps"] = old["reps"]
+                stats["best_date"] = old.get("date")
+        # Stored as a plain list so the profile stays msgpack-serializable
+        stats["rep_time_counts"] = merge_histograms(
+            stats.get("rep_time_counts", []), rep_time_histogram(folded_rep_times)).tolist()
+        del progress[:overflow]
+
     def start_session(self, exercise):
         if exercise in EXERCISE_TRACKERS:
             self.current_exercise = exercise
             self.current_tracker = EXERCISE_TRACKERS[exercise]()
             self.session_results = {"rep_times": [], "rep_count": 0, "feedback_history": []}
-            self.video_frames = []
+            self.discard_workout_video()  # Drop any recording left from an unfinished session
             self.previous_feedback = ""
             self.last_spoken_time = 0
             self.recording = True
@@ -73,16 +145,32 @@ class AppManager:
             print(f"Invalid exercise selected: {exercise}")
             return False
 
-    def process_frame(self, frame):
+    def process_frame(self, frame, draw=True):
         if self.recording and self.frame_count < self.max_frames:
-            # Store a copy of the frame for video recording
-            self.video_frames.append(frame.copy())
-            self.frame_count += 1
+            with self.video_lock:
+                # Checked again under the lock, since end_session may have just stopped recording
+                if self.recording and self.video_writer is None:
+                    self.start_video_writer(frame)
+                frame_buffer, free_slots, frame_queue, writer_thread = (
+                    self.frame_buffer, self.free_slots, self.frame_queue, self.writer_thread)
+            # Copy into a free ring slot for the writer thread, since the tracker draws on
+            # the frame in place; waits if the encoder falls a full ring behind, and drops
+            # the frame if it stays stuck (or the writer has stopped or died)
+            if (writer_thread is not None and frame.shape == frame_buffer.shape[1:]
+                    and writer_thread.is_alive()):
+                try:
+                    slot = free_slots.get(timeout=self.slot_timeout)
+                except queue.Empty:
+                    print("Video writer is not keeping up, dropping frame")
+                else:
+                    np.copyto(frame_buffer[slot], frame)
+                    frame_queue.put(slot)
+                    self.frame_count += 1
         
         if self.current_tracker is not None:
             try:
                 # Process the frame with the current exercise tracker
-                processed_frame, feedback, rep_count, rep_time = self.current_tracker.track(frame)
+                processed_frame, feedback, rep_count, rep_time = self.current_tracker.track(frame, draw=draw)
                 
                 # Handle text-to-speech feedback
                 current_time = time.time()
@@ -104,9 +192,10 @@ class AppManager:
                     self.previous_feedback = feedback
                     self.last_spoken_time = current_time
                     
-                    # Store feedback in session results
+                    # Store feedback in session results; trackers build a fresh string for
+                    # every rep, so intern it to keep one copy of each distinct message
                     if feedback and not feedback.startswith("Waiting for user"):
-                        self.session_results["feedback_history"].append(feedback)
+                        self.session_results["feedback_history"].append(sys.intern(feedback))
                 
                 # Update rep count and times
                 if rep_count > self.session_results["rep_count"] and rep_time > 0:
@@ -125,35 +214,94 @@ class AppManager:
                 
         return frame, 0, self.session_results
 
-    def save_workout_video(self, filename=None):
-        """Save the recorded workout video."""
-        if not self.video_frames:
-            return False, "No frames to save"
-            
-        if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            exercise = self.current_exercise.replace(" ", "_") if self.current_exercise else "workout"
-            filename = f"{exercise}_{timestamp}.mp4"
+    def start_video_writer(self, frame):
+        """Open the session video and start the thread that encodes queued frames."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        exercise = self.current_exercise.replace(" ", "_") if self.current_exercise else "workout"
         
         # Ensure uploads directory exists
         os.makedirs('uploads', exist_ok=True)
+        self.video_path = os.path.join('uploads', f"{exercise}_{timestamp}.mp4")
         
-        # Complete filepath
-        filepath = os.path.join('uploads', filename)
+        # Get frame dimensions from the first frame
+        h, w, _ = frame.shape
         
+        # Hardware H.264 (NVENC/VAAPI) when available, software MPEG-4 otherwise
+        self.video_writer = open_video_writer(self.video_path, 25.0, (w, h))
+        
+        # One contiguous allocation reused for the whole session; the fixed number
+        # of slots bounds memory and applies backpressure to a slow encoder
+        self.frame_buffer = np.empty((self.buffer_slots,) + frame.shape, dtype=frame.dtype)
+        self.free_slots = queue.Queue()
+        for slot in range(self.buffer_slots):
+            self.free_slots.put(slot)
+        self.frame_queue = queue.Queue()
+        self.writer_thread = threading.Thread(
+            target=self._write_frames,
+            args=(self.video_writer, self.frame_buffer, self.frame_queue, self.free_slots),
+            daemon=True
+        )
+        self.writer_thread.start()
+        
+    @staticmethod
+    def _write_frames(writer, frame_buffer, frame_queue, free_slots):
+        """Encode queued ring slots until the None sentinel arrives."""
+        # Even if the encoder raises, hand the slot back and close the video
         try:
-            # Get frame dimensions from the first frame
-            h, w, _ = self.video_frames[0].shape
+            while True:
+                slot = frame_queue.get()
+                if slot is None:
+                    break
+                try:
+                    writer.write(frame_buffer[slot])
+                finally:
+                    free_slots.put(slot)
+        finally:
+            writer.release()
+        
+    def stop_video_writer(self, drop_pending=False):
+        """Flush queued frames and close the video. Returns the file path, if any."""
+        # Detach the writer under the lock, then drain it outside so frames aren't held up
+        with self.video_lock:
+            if self.video_writer is None:
+                return None
+            filepath, frame_queue, writer_thread = self.video_path, self.frame_queue, self.writer_thread
+            self.video_writer = None
+            self.video_path = None
+            self.frame_buffer = None
+            self.free_slots = None
+            self.frame_queue = None
+            self.writer_thread = None
+        if drop_pending:
+            # Skip encoding frames that are about to be thrown away
+            try:
+                while True:
+                    frame_queue.get_nowait()
+            except queue.Empty:
+                pass
+        frame_queue.put(None)
+        writer_thread.join()
+        return filepath
+        
+    def discard_workout_video(self):
+        """Stop recording and delete the partially written video."""
+        filepath = self.stop_video_writer(drop_pending=True)
+        if filepath and os.path.exists(filepath):
+            os.remove(filepath)
+
+    def save_workout_video(self, filename=None):
+        """Save the recorded workout video."""
+        if self.video_writer is None:
+            return False, "No frames to save"
             
-            # Create video writer with H.264 codec for better compatibility
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # or 'avc1' for H.264 in MP4
-            out = cv2.VideoWriter(filepath, fourcc, 25.0, (w, h))
+        try:
+            filepath = self.stop_video_writer()
             
-            # Write frames to video
-            for frame in self.video_frames:
-                out.write(frame)
+            if filename is not None:
+                target = os.path.join('uploads', filename)
+                os.replace(filepath, target)
+                filepath = target
             
-            out.release()
             print(f"Video saved successfully to {filepath}")
             return True, filepath
         except Exception as e:
@@ -176,12 +324,18 @@ class AppManager:
                 "feedback": self.session_results["feedback_history"]
             }
         
+        # Stop recording before the writer is closed, so a frame still in flight
+        # doesn't start a new video
+        self.recording = False
+        
         # Save video if requested
         video_saved = False
         video_path = ""
-        if save_video and self.video_frames:
+        if save_video and self.video_writer is not None:
             self.tts.speak("Saving your workout video.")
             video_saved, video_path = self.save_workout_video()
+        else:
+            self.discard_workout_video()
             
         # Update profile with session data
         if self.current_exercise and summary["total_reps"] > 0:  # Only save if reps were completed
@@ -196,11 +350,10 @@ class AppManager:
                 "avg_rep_time": sum(summary["rep_times"]) / len(summary["rep_times"]) if summary["rep_times"] else 0
             }
             
-            self.profile[self.current_exercise]["progress"].append(workout_data)
+            self.add_workout(self.current_exercise, workout_data)
             
             # Save updated profile to file
-            with open(self.profile_path, 'w') as f:
-                json.dump(self.profile, f, indent=2)
+            self.save_profile()
                 
             # Say something encouraging if they improved
             previous_sessions = [p for p in self.profile[self.current_exercise]["progress"][:-1] 
@@ -211,10 +364,6 @@ class AppManager:
                     improvement = summary["total_reps"] - last_session.get("reps", 0)
                     self.tts.speak(f"Great job! You improved by {improvement} reps since your last workout.")
         
-        # Reset recording state
-        self.recording = False
-        self.video_frames = []
-        
         # Clean up
         self.current_tracker = None
         self.current_exercise = None
@@ -1,191 +1,390 @@
 # core/pose_detector.py
+import os
 import cv2
 import mediapipe as mp
 import math
+import threading
+import time
 import numpy as np
+from functools import lru_cache
+from types import SimpleNamespace
+from mediapipe.framework.formats import landmark_pb2
+
+mp_pose = mp.solutions.pose
+
+# The shared Pose graphs and GPU landmarkers are not safe to run from several threads at once
+# (e.g. two overlapping /process_frame requests), so inference is serialized
+pose_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def get_pose(min_detection_confidence=0.5, min_tracking_confidence=0.5, model_complexity=1):
+    """
+    Return a shared MediaPipe Pose graph for the given settings.
+    Building the graph loads the TFLite model, so it is done once per
+    configuration instead of for every tracker a session creates.
+    """
+    try:
+        return mp_pose.Pose(
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            model_complexity=model_complexity
+        )
+    except Exception as e:
+        if model_complexity == 1:
+            raise
+        # Only the full model ships with mediapipe; the Lite and Heavy models are
+        # downloaded on first use, so fall back when that isn't possible (the
+        # fallback is cached too, so the download is not retried every session)
+        print(f"Pose model {model_complexity} unavailable ({e}), using the full model")
+        # Called with keywords like PoseDetector does, so lru_cache reuses the same full graph
+        return get_pose(min_detection_confidence=min_detection_confidence,
+                        min_tracking_confidence=min_tracking_confidence,
+                        model_complexity=1)
+
+def default_model_complexity():
+    """
+    Pick the Pose model: the Lite model (0) when POSE_LITE=1 is set, otherwise the
+    full model (1). Lite is opt-in because mediapipe downloads it into site-packages
+    on first use, which fails on offline or read-only deploys.
+    """
+    if os.environ.get('POSE_LITE') == '1':
+        return 0
+    return 1
+
+def default_use_gpu():
+    """
+    Run pose inference on the GPU landmarker only when POSE_GPU=1 is set.
+    The GPU delegate needs OpenGL ES on Linux (apt install mesa-common-dev
+    libegl1-mesa-dev libgles2-mesa-dev); it helps most with the heavy model and
+    may be no faster than the CPU on integrated GPUs, so it is opt-in.
+    """
+    return os.environ.get('POSE_GPU') == '1'
+
+# Pose Landmarker bundles for the Tasks API, by model_complexity. They are not part of
+# the mediapipe wheel; download them into POSE_TASK_MODEL_DIR (default "models")
+POSE_TASK_MODELS = {0: 'pose_landmarker_lite.task', 1: 'pose_landmarker_full.task', 2: 'pose_landmarker_heavy.task'}
+
+@lru_cache(maxsize=None)
+def get_gpu_landmarker(model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    """
+    Return a shared Tasks API PoseLandmarker running on the GPU delegate, or None
+    when the model bundle or a usable GPU is missing. Like get_pose, it is built
+    once per configuration and lives for the whole process (a None result is
+    cached too, so a failing GPU setup is not retried every session).
+    """
+    from mediapipe.tasks.python import BaseOptions, vision
+    model_path = os.path.join(os.environ.get('POSE_TASK_MODEL_DIR', 'models'), POSE_TASK_MODELS[model_complexity])
+    try:
+        options = vision.PoseLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=model_path, delegate=BaseOptions.Delegate.GPU),
+            running_mode=vision.RunningMode.VIDEO,
+            min_pose_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        return vision.PoseLandmarker.create_from_options(options)
+    except Exception as e:
+        print(f"GPU pose landmarker unavailable ({e}), using the CPU Pose graph")
+        return None
+
+# Last timestamp passed to a GPU landmarker. VIDEO mode needs strictly increasing
+# timestamps, and the landmarkers are shared by every detector
+last_gpu_timestamp_ms = -1
+
+def next_gpu_timestamp_ms():
+    """Timestamp for the next detect_for_video call; call with pose_lock held."""
+    global last_gpu_timestamp_ms
+    last_gpu_timestamp_ms = max(int(time.monotonic() * 1000), last_gpu_timestamp_ms + 1)
+    return last_gpu_timestamp_ms
+
+# Column indices of the arrays returned by landmarks_to_array
+LM_X, LM_Y, LM_Z, LM_VISIBILITY, LM_PRESENCE = range(5)
+
+def landmarks_to_array(landmarks):
+    """
+    Pack MediaPipe landmarks into an (N, 5) array of x, y, z, visibility, presence.
+    A landmark without a presence score gets 1.0, as MediaPipe's drawing code treats it as present.
+    """
+    return np.array([
+        (lm.x, lm.y, lm.z, lm.visibility, lm.presence if lm.HasField('presence') else 1.0)
+        for lm in landmarks
+    ])
+
+def calculate_angle_xy(a, b, c):
+    """
+    PoseDetector.calculate_angle for plain (x, y) points, e.g. rows of landmark_array
+    converted with tolist(). Returns the angle at b in degrees.
+    """
+    radians = math.atan2(c[1] - b[1], c[0] - b[0]) - math.atan2(a[1] - b[1], a[0] - b[0])
+    angle = abs(radians * 180.0 / math.pi)
+    
+    if angle > 180:
+        angle = 360 - angle
+        
+    return angle
+
+def calculate_angles_batch(pts):
+    """
+    Vectorized version of PoseDetector.calculate_angle.
+    Takes an (N, 3, 2) array of (a, b, c) points and returns the N angles at b in degrees.
+    """
+    ba = pts[:, 0] - pts[:, 1]
+    bc = pts[:, 2] - pts[:, 1]
+    radians = np.arctan2(bc[:, 1], bc[:, 0]) - np.arctan2(ba[:, 1], ba[:, 0])
+    angles = np.abs(np.degrees(radians))
+    return np.where(angles > 180, 360 - angles, angles)
+
+def darken_info_bar(frame, height=101):
+    """
+    Darken the top info bar of a tracker frame to 30% in place.
+    Gives the same pixels as blending a full-frame copy with a filled black
+    rectangle over rows 0-100, but only touches those rows.
+    """
+    info_bar = frame[:height]
+    cv2.addWeighted(info_bar, 0.3, info_bar, 0, 0, info_bar)
 
 class PoseDetector:
-    def __init__(self):
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-            model_complexity=1  # Use 1 for balance of speed and accuracy
+    # Define pose landmarks for easier access (resolved once at import)
+    LEFT_SHOULDER = mp_pose.PoseLandmark.LEFT_SHOULDER.value
+    LEFT_HIP = mp_pose.PoseLandmark.LEFT_HIP.value
+    LEFT_KNEE = mp_pose.PoseLandmark.LEFT_KNEE.value
+    LEFT_ANKLE = mp_pose.PoseLandmark.LEFT_ANKLE.value
+    LEFT_ELBOW = mp_pose.PoseLandmark.LEFT_ELBOW.value
+    LEFT_WRIST = mp_pose.PoseLandmark.LEFT_WRIST.value
+    LEFT_FOOT_INDEX = mp_pose.PoseLandmark.LEFT_FOOT_INDEX.value
+    
+    RIGHT_SHOULDER = mp_pose.PoseLandmark.RIGHT_SHOULDER.value
+    RIGHT_HIP = mp_pose.PoseLandmark.RIGHT_HIP.value
+    RIGHT_KNEE = mp_pose.PoseLandmark.RIGHT_KNEE.value
+    RIGHT_ANKLE = mp_pose.PoseLandmark.RIGHT_ANKLE.value
+    RIGHT_ELBOW = mp_pose.PoseLandmark.RIGHT_ELBOW.value
+    RIGHT_WRIST = mp_pose.PoseLandmark.RIGHT_WRIST.value
+    RIGHT_FOOT_INDEX = mp_pose.PoseLandmark.RIGHT_FOOT_INDEX.value
+    
+    NOSE = mp_pose.PoseLandmark.NOSE.value
+    
+    # Joint triples (a, b, c) shown by draw_angle_indicators and the text offset for each
+    INDICATOR_JOINTS = np.array([
+        [LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST],
+        [RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST],
+        [LEFT_HIP, LEFT_KNEE, LEFT_ANKLE],
+        [RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE]
+    ], dtype=np.int32)
+    INDICATOR_OFFSETS = (-50, 10, -50, 10)
+    
+    # Skeleton connections as an (M, 2) array of landmark index pairs
+    POSE_CONNECTIONS = np.array(sorted(mp_pose.POSE_CONNECTIONS), dtype=np.int32)
+
+    # Frame-skip settings: inference is skipped while the variance of the
+    # 64x64 grayscale frame difference stays below the motion threshold
+    # (MOTION_THRESHOLD unless overridden), but never for more than
+    # MAX_SKIPPED_FRAMES frames in a row
+    MOTION_THRESHOLD = 2.0
+    MAX_SKIPPED_FRAMES = 2
+
+    def __init__(self, infer_width=640, motion_threshold=MOTION_THRESHOLD, model_complexity=None,
+                 min_detection_confidence=0.5, min_tracking_confidence=0.5, use_gpu=None):
+        self.mp_pose = mp_pose
+        # Frames wider than this are downscaled before inference; the model input is
+        # only 256x256 and landmarks are normalized, so drawing on the full frame is unaffected
+        self.infer_width = infer_width
+        if model_complexity is None:
+            model_complexity = default_model_complexity()
+        self.pose = get_pose(
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            model_complexity=model_complexity  # 1 balances speed and accuracy, 0 is the faster Lite model
         )
+        # With use_gpu (default: the POSE_GPU environment variable), inference runs on the
+        # shared GPU landmarker instead; self.pose remains the fallback
+        if use_gpu is None:
+            use_gpu = default_use_gpu()
+        self.landmarker = None
+        if use_gpu:
+            self.landmarker = get_gpu_landmarker(model_complexity, min_detection_confidence,
+                                                 min_tracking_confidence)
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
         
         # Define custom drawing specifications for better visibility
         self.custom_connections_style = self.mp_drawing_styles.get_default_pose_landmarks_style()
+        self.landmark_spec = self.mp_drawing.DrawingSpec(
+            color=(0, 255, 0),  # Bright green color
+            thickness=4,
+            circle_radius=4
+        )
+        self.connection_spec = self.mp_drawing.DrawingSpec(
+            color=(255, 80, 0),  # Orange color for connections
+            thickness=2
+        )
         
-        # Define pose landmarks for easier access
-        self.LEFT_SHOULDER = self.mp_pose.PoseLandmark.LEFT_SHOULDER.value
-        self.LEFT_HIP = self.mp_pose.PoseLandmark.LEFT_HIP.value
-        self.LEFT_KNEE = self.mp_pose.PoseLandmark.LEFT_KNEE.value
-        self.LEFT_ANKLE = self.mp_pose.PoseLandmark.LEFT_ANKLE.value
-        self.LEFT_ELBOW = self.mp_pose.PoseLandmark.LEFT_ELBOW.value
-        self.LEFT_WRIST = self.mp_pose.PoseLandmark.LEFT_WRIST.value
-        self.LEFT_FOOT_INDEX = self.mp_pose.PoseLandmark.LEFT_FOOT_INDEX.value
+        # Do the colour conversion on the GPU when OpenCV was built with CUDA
+        # and a device is present; stock opencv-python wheels report 0 devices
+        self.use_cuda = hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+        self.gpu_frame = cv2.cuda_GpuMat() if self.use_cuda else None
+        # Resize and RGB destination buffers reused across frames of the same size
+        self.small_buffer = None
+        self.rgb_buffer = None
         
-        self.RIGHT_SHOULDER = self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value
-        self.RIGHT_HIP = self.mp_pose.PoseLandmark.RIGHT_HIP.value
-        self.RIGHT_KNEE = self.mp_pose.PoseLandmark.RIGHT_KNEE.value
-        self.RIGHT_ANKLE = self.mp_pose.PoseLandmark.RIGHT_ANKLE.value
-        self.RIGHT_ELBOW = self.mp_pose.PoseLandmark.RIGHT_ELBOW.value
-        self.RIGHT_WRIST = self.mp_pose.PoseLandmark.RIGHT_WRIST.value
-        self.RIGHT_FOOT_INDEX = self.mp_pose.PoseLandmark.RIGHT_FOOT_INDEX.value
+        # State for skipping inference on near-identical frames; a threshold of 0 disables skipping
+        self.motion_threshold = motion_threshold
+        self.prev_small = None
+        self.last_results = None
+        self.skipped_frames = 0
         
-        self.NOSE = self.mp_pose.PoseLandmark.NOSE.value
+        # Landmarks of the current results as an (33, 5) array, or None when no pose was found
+        self.landmark_array = None
+
+    def is_static(self, frame):
+        """
+        Return True when the frame barely differs from the previous one.
+        Compares 64x64 grayscale thumbnails, which is far cheaper than inference.
+        """
+        small = cv2.cvtColor(cv2.resize(frame, (64, 64), interpolation=cv2.INTER_LINEAR), cv2.COLOR_BGR2GRAY)
+        prev_small, self.prev_small = self.prev_small, small
+        if prev_small is None:
+            return False
+        return np.var(cv2.absdiff(prev_small, small)) < self.motion_threshold
 
-    def process_frame(self, frame):
-        """Process a frame and detect pose landmarks."""
+    def process_frame(self, frame, draw=True):
+        """
+        Process a frame and detect pose landmarks.
+        With draw=False only the landmarks are computed and the frame is left untouched.
+        """
         if frame is None or frame.size == 0:
             return None
         
-        # Convert the BGR image to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # To improve performance, mark the image as not writeable
-        rgb_frame.flags.writeable = False
-        
-        # Process the frame and detect the pose
-        results = self.pose.process(rgb_frame)
-        
-        # Make the image writeable again for drawing
-        rgb_frame.flags.writeable = True
+        # Reuse the previous landmarks while the user is holding still
+        static = self.is_static(frame)
+        if (static and self.last_results is not None and self.last_results.pose_landmarks
+                and self.skipped_frames < self.MAX_SKIPPED_FRAMES):
+            results = self.last_results
+            self.skipped_frames += 1
+        else:
+            # Shrink large frames so less data goes through the colour conversion and into MediaPipe
+            h, w = frame.shape[:2]
+            if w > self.infer_width:
+                small_shape = (int(h * self.infer_width / w), self.infer_width, 3)
+                if self.small_buffer is None or self.small_buffer.shape != small_shape:
+                    self.small_buffer = np.empty(small_shape, dtype=np.uint8)
+                infer_frame = cv2.resize(frame, small_shape[1::-1], dst=self.small_buffer,
+                                         interpolation=cv2.INTER_LINEAR)
+            else:
+                infer_frame = frame
+            
+            # Convert the BGR image to RGB
+            if self.use_cuda:
+                self.gpu_frame.upload(infer_frame)
+                rgb_frame = cv2.cuda.cvtColor(self.gpu_frame, cv2.COLOR_BGR2RGB).download()
+            else:
+                # A frame[..., ::-1] view looks free, but MediaPipe copies non-contiguous
+                # arrays element by element (~25x slower than cvtColor into a reused buffer)
+                if self.rgb_buffer is None or self.rgb_buffer.shape != infer_frame.shape:
+                    self.rgb_buffer = np.empty(infer_frame.shape, dtype=np.uint8)
+                rgb_frame = cv2.cvtColor(infer_frame, cv2.COLOR_BGR2RGB, dst=self.rgb_buffer)
+            
+            # To improve performance, mark the image as not writeable
+            rgb_frame.flags.writeable = False
+            
+            # Process the frame and detect the pose
+            with pose_lock:
+                if self.landmarker is not None:
+                    results = self.detect_gpu(rgb_frame)
+                else:
+                    results = self.pose.process(rgb_frame)
+            
+            # Make the image writeable again for drawing
+            rgb_frame.flags.writeable = True
+            
+            self.last_results = results
+            self.skipped_frames = 0
+            
+            # Read the protobuf landmarks once per inference instead of per attribute access
+            if results.pose_landmarks:
+                self.landmark_array = landmarks_to_array(results.pose_landmarks.landmark)
+            else:
+                self.landmark_array = None
         
         # Draw the pose landmarks on the frame if landmarks detected
-        if results.pose_landmarks:
-            # Create a custom drawing spec for better visibility
-            landmark_spec = self.mp_drawing.DrawingSpec(
-                color=(0, 255, 0),  # Bright green color
-                thickness=4,
-                circle_radius=4
-            )
-            connection_spec = self.mp_drawing.DrawingSpec(
-                color=(255, 80, 0),  # Orange color for connections
-                thickness=2
-            )
-            
+        if draw and results.pose_landmarks:
             # Draw landmarks
-            self.mp_drawing.draw_landmarks(
-                frame, 
-                results.pose_landmarks, 
-                self.mp_pose.POSE_CONNECTIONS,
-                landmark_drawing_spec=landmark_spec,
-                connection_drawing_spec=connection_spec
-            )
+            self.draw_landmarks(frame, self.landmark_array)
             
             # Draw angle indicators for key joints (example for elbows and knees)
-            self.draw_angle_indicators(frame, results.pose_landmarks.landmark)
+            self.draw_angle_indicators(frame, self.landmark_array)
             
         return results
 
-    def draw_angle_indicators(self, frame, landmarks):
-        """Draw angle indicators for key joints"""
+    def detect_gpu(self, rgb_frame):
+        """
+        Run the GPU landmarker on an RGB frame and return its first pose in the
+        same shape as Pose.process results (pose_landmarks is None when no pose was found).
+        Must be called with pose_lock held.
+        """
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        result = self.landmarker.detect_for_video(image, next_gpu_timestamp_ms())
+        if not result.pose_landmarks:
+            return SimpleNamespace(pose_landmarks=None)
+        # The Tasks landmarks' visibility and presence are Optional
+        return SimpleNamespace(pose_landmarks=landmark_pb2.NormalizedLandmarkList(landmark=[
+            landmark_pb2.NormalizedLandmark(
+                x=lm.x, y=lm.y, z=lm.z,
+                visibility=lm.visibility if lm.visibility is not None else 0.0,
+                presence=lm.presence if lm.presence is not None else 0.0
+            )
+            for lm in result.pose_landmarks[0]
+        ]))
+
+    def draw_landmarks(self, frame, coords):
+        """
+        Draw the pose skeleton from a landmark array.
+        Produces the same image as mp_drawing.draw_landmarks with our drawing specs,
+        but draws all connections with a single cv2.polylines call.
+        """
         h, w, _ = frame.shape
+        x = coords[:, LM_X]
+        y = coords[:, LM_Y]
         
-        # Draw left elbow angle
-        if (landmarks[self.LEFT_SHOULDER].visibility > 0.5 and 
-            landmarks[self.LEFT_ELBOW].visibility > 0.5 and
-            landmarks[self.LEFT_WRIST].visibility > 0.5):
-            
-            angle = self.calculate_angle(
-                landmarks[self.LEFT_SHOULDER], 
-                landmarks[self.LEFT_ELBOW], 
-                landmarks[self.LEFT_WRIST]
-            )
-            
-            # Convert normalized coordinates to pixel coordinates
-            elbow_x = int(landmarks[self.LEFT_ELBOW].x * w)
-            elbow_y = int(landmarks[self.LEFT_ELBOW].y * h)
-            
-            # Draw angle text
-            cv2.putText(
-                frame, 
-                f"{int(angle)}°", 
-                (elbow_x - 50, elbow_y), 
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                0.6, 
-                (255, 255, 255),
-                2, 
-                cv2.LINE_AA
-            )
+        # Like MediaPipe, skip low-confidence landmarks and any outside the image
+        shown = ((coords[:, LM_VISIBILITY] >= 0.5) & (coords[:, LM_PRESENCE] >= 0.5) &
+                 (x >= 0) & (x <= 1) & (y >= 0) & (y <= 1))
+        points = np.stack([
+            np.minimum(np.floor(x * w), w - 1),
+            np.minimum(np.floor(y * h), h - 1)
+        ], axis=1).astype(np.int32)
         
-        # Draw right elbow angle
-        if (landmarks[self.RIGHT_SHOULDER].visibility > 0.5 and 
-            landmarks[self.RIGHT_ELBOW].visibility > 0.5 and
-            landmarks[self.RIGHT_WRIST].visibility > 0.5):
-            
-            angle = self.calculate_angle(
-                landmarks[self.RIGHT_SHOULDER], 
-                landmarks[self.RIGHT_ELBOW], 
-                landmarks[self.RIGHT_WRIST]
-            )
-            
-            # Convert normalized coordinates to pixel coordinates
-            elbow_x = int(landmarks[self.RIGHT_ELBOW].x * w)
-            elbow_y = int(landmarks[self.RIGHT_ELBOW].y * h)
-            
-            # Draw angle text
-            cv2.putText(
-                frame, 
-                f"{int(angle)}°", 
-                (elbow_x + 10, elbow_y), 
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                0.6, 
-                (255, 255, 255),
-                2, 
-                cv2.LINE_AA
-            )
+        # Connections between two shown landmarks
+        segments = points[self.POSE_CONNECTIONS[shown[self.POSE_CONNECTIONS].all(axis=1)]]
+        if len(segments):
+            cv2.polylines(frame, segments, False, self.connection_spec.color, self.connection_spec.thickness)
         
-        # Draw left knee angle
-        if (landmarks[self.LEFT_HIP].visibility > 0.5 and 
-            landmarks[self.LEFT_KNEE].visibility > 0.5 and
-            landmarks[self.LEFT_ANKLE].visibility > 0.5):
-            
-            angle = self.calculate_angle(
-                landmarks[self.LEFT_HIP], 
-                landmarks[self.LEFT_KNEE], 
-                landmarks[self.LEFT_ANKLE]
-            )
-            
-            # Convert normalized coordinates to pixel coordinates
-            knee_x = int(landmarks[self.LEFT_KNEE].x * w)
-            knee_y = int(landmarks[self.LEFT_KNEE].y * h)
-            
-            # Draw angle text
-            cv2.putText(
-                frame, 
-                f"{int(angle)}°", 
-                (knee_x - 50, knee_y), 
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                0.6, 
-                (255, 255, 255),
-                2, 
-                cv2.LINE_AA
-            )
+        # Landmark points go on top, each a white border ring then the coloured ring
+        spec = self.landmark_spec
+        border_radius = max(spec.circle_radius + 1, int(spec.circle_radius * 1.2))
+        for point in points[shown].tolist():
+            point = tuple(point)
+            cv2.circle(frame, point, border_radius, self.mp_drawing.WHITE_COLOR, spec.thickness)
+            cv2.circle(frame, point, spec.circle_radius, spec.color, spec.thickness)
+
+    def draw_angle_indicators(self, frame, coords):
+        """Draw angle indicators for key joints, given the landmark array from landmarks_to_array"""
+        h, w, _ = frame.shape
         
-        # Draw right knee angle
-        if (landmarks[self.RIGHT_HIP].visibility > 0.5 and 
-            landmarks[self.RIGHT_KNEE].visibility > 0.5 and
-            landmarks[self.RIGHT_ANKLE].visibility > 0.5):
-            
-            angle = self.calculate_angle(
-                landmarks[self.RIGHT_HIP], 
-                landmarks[self.RIGHT_KNEE], 
-                landmarks[self.RIGHT_ANKLE]
-            )
-            
-            # Convert normalized coordinates to pixel coordinates
-            knee_x = int(landmarks[self.RIGHT_KNEE].x * w)
-            knee_y = int(landmarks[self.RIGHT_KNEE].y * h)
+        # Compute all indicator angles in one vectorized pass
+        triples = coords[self.INDICATOR_JOINTS]  # (4, 3, 5): joint triple x point x landmark column
+        angles = calculate_angles_batch(triples[:, :, LM_X:LM_Y + 1])
+        visible = (triples[:, :, LM_VISIBILITY] > 0.5).all(axis=1)
+        
+        # Convert the joint positions to pixel coordinates in one step (truncating like int())
+        joints_px = (triples[:, 1, LM_X:LM_Y + 1] * (w, h)).astype(np.int32).tolist()
+        
+        for i in np.flatnonzero(visible):
+            joint_x, joint_y = joints_px[i]
             
             # Draw angle text
             cv2.putText(
                 frame, 
-                f"{int(angle)}°", 
-                (knee_x + 10, knee_y), 
+                f"{int(angles[i])}°", 
+                (joint_x + self.INDICATOR_OFFSETS[i], joint_y), 
                 cv2.FONT_HERSHEY_SIMPLEX, 
                 0.6, 
                 (255, 255, 255),
@@ -199,17 +398,7 @@ class PoseDetector:
         Calculate the angle between three points a, b, c.
         The angle is calculated in degrees between the lines ab and bc.
         """
-        a_x, a_y = a.x, a.y
-        b_x, b_y = b.x, b.y
-        c_x, c_y = c.x, c.y
-        
-        radians = math.atan2(c_y - b_y, c_x - b_x) - math.atan2(a_y - b_y, a_x - b_x)
-        angle = abs(radians * 180.0 / math.pi)
-        
-        if angle > 180:
-            angle = 360 - angle
-            
-        return angle
+        return calculate_angle_xy((a.x, a.y), (b.x, b.y), (c.x, c.y))
 
     @staticmethod
     def check_alignment(a, b, c):
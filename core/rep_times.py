@@ -0,0 +1,27 @@
+# core/rep_times.py
+import numpy as np
+
+def rep_time_histogram(rep_times):
+    """
+    Count rep times per half-second interval: bin i holds the reps that took i/2
+    seconds once rounded (np.rint rounds halves to even, like round()).
+    """
+    return np.bincount(np.rint(np.asarray(rep_times, dtype=float) * 2).astype(np.int64))
+
+def merge_histograms(a, b):
+    """Add two rep time histograms of possibly different lengths"""
+    a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+    if len(a) < len(b):
+        a, b = b, a
+    merged = a.copy()
+    merged[:len(b)] += b
+    return merged
+
+def histogram_intervals(counts):
+    """A rep time histogram as a {seconds: count} dict, without empty intervals"""
+    intervals = np.flatnonzero(counts)
+    return dict(zip((intervals / 2).tolist(), counts[intervals].tolist()))
+
+def rep_time_intervals(rep_times):
+    """rep_time_histogram as the {seconds: count} dict of session summaries"""
+    return histogram_intervals(rep_time_histogram(rep_times))
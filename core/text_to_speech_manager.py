@@ -1,15 +1,42 @@
 # core/text_to_speech_manager.py
+import os
+import shutil
+import subprocess
 import pyttsx3
+import queue
 import threading
 import time
+from collections import OrderedDict
 
 class TextToSpeechManager:
-    def __init__(self):
+    # Only the newest few messages are kept so speech never lags far behind the workout
+    MAX_PENDING = 2
+    # Number of recent messages remembered for the repeat cooldown
+    MAX_REMEMBERED = 128
+    # espeak-ng settings matching the pyttsx3 ones: female voice, 150 wpm, 90% volume
+    ESPEAK_ARGS = ["-v", "en+f3", "-s", "150", "-a", "90"]
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: "espeak-ng" or "pyttsx3". Defaults to the TTS_BACKEND environment
+                variable, else espeak-ng when it is installed, else pyttsx3.
+        """
+        if backend is None:
+            backend = os.environ.get('TTS_BACKEND') or ("espeak-ng" if shutil.which("espeak-ng") else "pyttsx3")
+        self.backend = backend
+        
         self.engine = None
-        self.init_engine()
-        self.last_spoken = {}
+        if self.backend == "pyttsx3":
+            self.init_engine()
+        self.last_spoken = OrderedDict()  # text -> last spoken time, least recent first
         self.lock = threading.Lock()
         
+        # A single worker drains the queue so frame processing never waits on the audio engine
+        self.speech_queue = queue.Queue(maxsize=self.MAX_PENDING)
+        self.worker = threading.Thread(target=self._speech_worker, daemon=True)
+        self.worker.start()
+        
     def init_engine(self):
         try:
             self.engine = pyttsx3.init()
@@ -35,6 +62,10 @@ class TextToSpeechManager:
             return False
 
     def _speak(self, text):
+        if self.backend == "espeak-ng":
+            self._speak_espeak(text)
+            return
+            
         if not self.engine:
             success = self.init_engine()
             if not success:
@@ -49,6 +80,19 @@ class TextToSpeechManager:
             # Try to reinitialize the engine
             self.init_engine()
 
+    def _speak_espeak(self, text):
+        # A short-lived espeak-ng process starts in a few tens of milliseconds,
+        # far quicker than a pyttsx3 runAndWait cycle for one short cue
+        try:
+            subprocess.run(["espeak-ng"] + self.ESPEAK_ARGS + [text],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=15)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"Text-to-speech error: {e}")
+
+    def _speech_worker(self):
+        while True:
+            self._speak(self.speech_queue.get())
+
     def speak(self, text, cooldown=5):
         """
         Speak text with a cooldown to prevent repeated messages.
@@ -66,10 +110,21 @@ class TextToSpeechManager:
                 if current_time - last_time < cooldown:
                     return  # Skip if said too recently
             
-            # Update the last spoken time
+            # Update the last spoken time, forgetting the least recently spoken
+            # messages so rep-count cues don't accumulate over a long session
             self.last_spoken[text] = current_time
+            self.last_spoken.move_to_end(text)
+            while len(self.last_spoken) > self.MAX_REMEMBERED:
+                self.last_spoken.popitem(last=False)
         
-        # Start a new thread to speak the text
-        thread = threading.Thread(target=self._speak, args=(text,))
-        thread.daemon = True
-        thread.start()
\ No newline at end of file
+        # Hand the text to the speech worker; when it is behind, drop the oldest
+        # pending message rather than this one, since the newest cue is the relevant one
+        while True:
+            try:
+                self.speech_queue.put_nowait(text)
+                return
+            except queue.Full:
+                try:
+                    self.speech_queue.get_nowait()
+                except queue.Empty:
+                    pass
\ No newline at end of file
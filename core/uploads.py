@@ -0,0 +1,10 @@
+# core/uploads.py
+
+def write_upload(file, path, chunk_size=1 << 20):
+    """
+    Save an uploaded file by copying its stream in large chunks, rather than
+    buffering it whole or going through file.save().
+    """
+    with open(path, 'wb', buffering=chunk_size) as out:
+        while chunk := file.stream.read(chunk_size):
+            out.write(chunk)
@@ -0,0 +1,82 @@
+# core/video_writer.py
+import shutil
+import subprocess
+from functools import lru_cache
+import cv2
+
+# Hardware H.264 encoders to try, in order of preference
+HW_ENCODERS = ["h264_nvenc", "h264_vaapi"]
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+def encoder_args(encoder):
+    """ffmpeg output arguments for the given H.264 encoder."""
+    if encoder == "h264_vaapi":
+        return ["-vaapi_device", VAAPI_DEVICE, "-vf", "format=nv12,hwupload", "-c:v", encoder]
+    return ["-c:v", encoder, "-preset", "p1", "-pix_fmt", "yuv420p"]
+
+@lru_cache(maxsize=1)
+def detect_hw_encoder():
+    """
+    Return the first hardware H.264 encoder that actually works on this machine, or None.
+    ffmpeg builds often list NVENC/VAAPI without a usable device, so each
+    candidate is checked by encoding a single test frame.
+    """
+    if shutil.which("ffmpeg") is None:
+        return None
+
+    for encoder in HW_ENCODERS:
+        cmd = ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "color=black:s=256x256",
+               "-frames:v", "1"] + encoder_args(encoder) + ["-f", "null", "-"]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if result.returncode == 0:
+            return encoder
+    return None
+
+class FFmpegVideoWriter:
+    """
+    Minimal stand-in for cv2.VideoWriter that pipes raw BGR frames into ffmpeg
+    so encoding happens on the GPU's H.264 engine.
+    """
+
+    def __init__(self, path, fps, size, encoder):
+        w, h = size
+        self.shape = (h, w, 3)
+        cmd = ["ffmpeg", "-loglevel", "error", "-y",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{w}x{h}", "-r", str(fps), "-i", "-"]
+        cmd += encoder_args(encoder) + [path]
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        # Set once ffmpeg has gone away; later writes are then dropped
+        self.failed = False
+
+    def write(self, frame):
+        # Like cv2.VideoWriter, silently skip frames that don't match the video size
+        if frame.shape != self.shape or self.failed:
+            return
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except OSError as e:
+            # BrokenPipeError when ffmpeg exited, e.g. on a bad device or unsupported size
+            self.failed = True
+            print(f"ffmpeg video writer stopped (exit code {self.process.poll()}): {e}")
+
+    def release(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            # Flushing the last buffered frames fails if ffmpeg already exited
+            self.failed = True
+        returncode = self.process.wait()
+        if returncode != 0:
+            print(f"ffmpeg video writer exited with code {returncode}")
+
+def open_video_writer(path, fps, size):
+    """Open a hardware H.264 writer when available, otherwise OpenCV's software MPEG-4 writer."""
+    encoder = detect_hw_encoder()
+    if encoder:
+        return FFmpegVideoWriter(path, fps, size, encoder)
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(path, fourcc, fps, size)
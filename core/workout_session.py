@@ -1,12 +1,52 @@
 # core/workout_session.py
 import os
 import cv2
-import json
+import orjson
 import time
+import threading
 import datetime
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Charts are only rendered to PNG, so skip loading a GUI backend
 import matplotlib.pyplot as plt
+from PIL import Image
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from core.rep_times import rep_time_histogram, merge_histograms
+
+# A single figure is reused by every chart instead of building a new one per call.
+# Charts can be requested from several threads, so the figure is only touched under chart_lock
+chart_figure = None
+chart_lock = threading.Lock()
+# ggplot for the look, plus 'fast' for more aggressive path simplification when drawing.
+# Applied per chart because the app switches the global style between requests
+CHART_STYLE = ['ggplot', 'fast']
+
+def get_chart_axes():
+    """Return the shared chart figure with a fresh set of axes (hold chart_lock)"""
+    global chart_figure
+    if chart_figure is None:
+        chart_figure = plt.figure(figsize=(10, 6), dpi=100)
+    else:
+        # New axes rather than ax.clear(), which keeps tick and grid settings
+        # from the previous chart; tight_layout also starts from the current
+        # margins, so undo the last chart's
+        chart_figure.clear()
+        chart_figure.subplots_adjust(**{
+            name: plt.rcParams[f'figure.subplot.{name}']
+            for name in ('left', 'right', 'bottom', 'top')
+        })
+    return chart_figure, chart_figure.add_subplot()
+
+def render_chart_png(fig):
+    """Render the figure and return it as PNG in a BytesIO (hold chart_lock)"""
+    # Encoding the Agg canvas directly with Pillow at a low zlib level skips
+    # savefig's second layout pass and default compression, roughly a third of
+    # the render time, for a somewhat larger file
+    fig.canvas.draw()
+    buffer = BytesIO()
+    Image.fromarray(np.asarray(fig.canvas.buffer_rgba())).save(buffer, 'PNG', compress_level=1)
+    return buffer
 
 class WorkoutSession:
     """
@@ -14,28 +54,90 @@ class WorkoutSession:
     This class integrates with the AppManager to provide a complete workout tracking experience.
     """
     
+    # One record per completed rep: rep time, epoch timestamp and form quality (NaN when unscored)
+    REP_DTYPE = np.dtype([('time', 'f8'), ('ts', 'f8'), ('quality', 'f8')])
+    
     def __init__(self, user_id="default_user"):
         self.user_id = user_id
         self.current_exercise = None
         self.session_start_time = None
         self.session_end_time = None
-        self.rep_data = []
+        # Reps go into a preallocated record array that doubles when full;
+        # the per-rep dicts saved to disk are only built at the end of the session
+        self.rep_buffer = np.empty(512, dtype=self.REP_DTYPE)
+        self.rep_count = 0
         self.feedback_data = []
         self.video_path = None
         
+        # Disk writes run on a single background thread so they never stall the
+        # caller, while still landing in the order they were submitted
+        self.io_executor = ThreadPoolExecutor(max_workers=1)
+        
+        # Running rep time histogram per exercise (bin i counts reps of i/2 seconds),
+        # kept in data/agg so charts never have to reread the session files
+        self.dist_dir = os.path.join("data", "agg")
+        self.rep_distributions = {}
+        
+        # Bumped whenever the profile changes; recommendations are reused until it moves
+        self.profile_version = 0
+        self.recommendations = None
+        self.recommendations_version = None
+        
         # Ensure session directory exists
         self.sessions_dir = os.path.join("data", "sessions")
         os.makedirs(self.sessions_dir, exist_ok=True)
         
-        # Path to user profile
+        # Path to user profile. Session references are kept out of it, in an
+        # append-only log with one JSON object per line, so saving a session
+        # appends one line instead of rewriting every session ever recorded
         self.profile_path = os.path.join("data", f"user_{user_id}_profile.json")
+        self.sessions_log_path = os.path.join("data", f"user_{user_id}_sessions.jsonl")
         self.load_user_profile()
     
     def load_user_profile(self):
         """Load user profile from file or create new one if it doesn't exist"""
         if os.path.exists(self.profile_path):
-            with open(self.profile_path, 'r') as f:
-                self.profile = json.load(f)
+            with open(self.profile_path, 'rb') as f:
+                self.profile = orjson.loads(f.read())
+            exercises = self.profile["exercises"]
+            
+            if any("sessions" in exercise for exercise in exercises.values()):
+                # Profile from before the session log: move its sessions into the log
+                log = b"".join(
+                    orjson.dumps({"exercise": name, **session}) + b"\n"
+                    for name, exercise in exercises.items()
+                    for session in exercise.get("sessions", [])
+                )
+                self.write_file_async(self.sessions_log_path, log)
+                for exercise in exercises.values():
+                    exercise.setdefault("sessions", [])
+                self.save_user_profile()
+            else:
+                for exercise in exercises.values():
+                    exercise["sessions"] = []
+                if os.path.exists(self.sessions_log_path):
+                    with open(self.sessions_log_path, 'rb') as f:
+                        lines = [line for line in f if line.strip()]
+                    valid_lines = []
+                    for line in lines:
+                        try:
+                            session = orjson.loads(line)
+                        except orjson.JSONDecodeError:
+                            # A crash during an append can leave the last line cut short
+                            print(f"Skipping unreadable line in {self.sessions_log_path}")
+                            continue
+                        valid_lines.append(line.rstrip(b"\r\n") + b"\n")
+                        name = session.pop("exercise")
+                        if name in exercises:
+                            exercises[name]["sessions"].append(session)
+                    if len(valid_lines) < len(lines):
+                        # Rewrite the log without the broken lines, so the next append starts on a fresh line
+                        self.write_file_async(self.sessions_log_path, b"".join(valid_lines))
+                                
+            # Reports rely on each exercise's sessions being in date order. end_session
+            # keeps it that way, so this only does work on a profile edited by hand
+            for exercise in exercises.values():
+                exercise["sessions"].sort(key=lambda x: x["date"])
         else:
             # Default profile structure
             self.profile = {
@@ -61,20 +163,83 @@ class WorkoutSession:
             self.save_user_profile()
     
     def save_user_profile(self):
-        """Save user profile to file"""
+        """Save user profile to file (written in the background)"""
+        self.profile_version += 1
+        # Sessions live in the session log, so only the small remainder is written.
+        # Serialize now so later profile changes can't leak into this write
+        profile = dict(self.profile, exercises={
+            name: {key: value for key, value in exercise.items() if key != "sessions"}
+            for name, exercise in self.profile["exercises"].items()
+        })
+        self.write_file_async(self.profile_path, orjson.dumps(profile, option=orjson.OPT_INDENT_2))
+    
+    @staticmethod
+    def _write_file(path, data, mode='wb'):
         # Ensure directory exists
-        os.makedirs(os.path.dirname(self.profile_path), exist_ok=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
         
-        with open(self.profile_path, 'w') as f:
-            json.dump(self.profile, f, indent=2)
+        with open(path, mode) as f:
+            f.write(data)
         
-        print(f"User profile saved to {self.profile_path}")
+        print(f"Saved {path}")
+    
+    def write_file_async(self, path, data):
+        """Queue bytes to be written to path on the background I/O thread"""
+        return self.io_executor.submit(self._write_file, path, data)
+    
+    def append_file_async(self, path, data):
+        """Queue bytes to be appended to path on the background I/O thread"""
+        return self.io_executor.submit(self._write_file, path, data, 'ab')
+    
+    def flush(self):
+        """Block until all queued writes have reached disk"""
+        self.io_executor.submit(lambda: None).result()
+    
+    def get_dist_path(self, exercise_name):
+        return os.path.join(self.dist_dir, f"user_{self.user_id}_{exercise_name.replace(' ', '_')}_dist.npy")
+    
+    def get_rep_distribution(self, exercise_name):
+        """Return the exercise's running rep time histogram, loading or rebuilding it on first use"""
+        if exercise_name in self.rep_distributions:
+            return self.rep_distributions[exercise_name]
+            
+        dist_path = self.get_dist_path(exercise_name)
+        if os.path.exists(dist_path):
+            distribution = np.load(dist_path)
+        else:
+            # First use for this user: count the rep times in each of their session files
+            # once (the profile's sessions are the ones in this user's session log)
+            distribution = np.zeros(0, dtype=np.int64)
+            existing_files = set(os.listdir(self.sessions_dir))
+            for session in self.profile["exercises"][exercise_name]["sessions"]:
+                filename = f"{session['id']}.json"
+                if filename not in existing_files:
+                    continue
+                with open(os.path.join(self.sessions_dir, filename), 'rb') as f:
+                    session_data = orjson.loads(f.read())
+                rep_times = [rep["time"] for rep in session_data.get("rep_data", [])]
+                distribution = merge_histograms(distribution, rep_time_histogram(rep_times))
+            self.save_rep_distribution(exercise_name, distribution)
+            
+        self.rep_distributions[exercise_name] = distribution
+        return distribution
+    
+    def add_rep_distribution(self, exercise_name, rep_times):
+        """Add a session's rep times to the exercise's running histogram and persist it"""
+        distribution = merge_histograms(self.get_rep_distribution(exercise_name), rep_time_histogram(rep_times))
+        self.rep_distributions[exercise_name] = distribution
+        self.save_rep_distribution(exercise_name, distribution)
+    
+    def save_rep_distribution(self, exercise_name, distribution):
+        buffer = BytesIO()
+        np.save(buffer, distribution)
+        self.write_file_async(self.get_dist_path(exercise_name), buffer.getvalue())
     
     def start_session(self, exercise_name):
         """Start a new workout session for the given exercise"""
         self.current_exercise = exercise_name
         self.session_start_time = datetime.datetime.now()
-        self.rep_data = []
+        self.rep_count = 0
         self.feedback_data = []
         
         print(f"Started {exercise_name} session at {self.session_start_time}")
@@ -85,29 +250,45 @@ class WorkoutSession:
         if not self.current_exercise:
             return False
             
-        rep_info = {
-            "time": rep_time,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "form_quality": rep_form_quality
-        }
-        
-        self.rep_data.append(rep_info)
+        if self.rep_count == len(self.rep_buffer):
+            self.rep_buffer = np.resize(self.rep_buffer, 2 * len(self.rep_buffer))
+            
+        quality = np.nan if rep_form_quality is None else rep_form_quality
+        self.rep_buffer[self.rep_count] = (rep_time, time.time(), quality)
+        self.rep_count += 1
         return True
     
+    def get_rep_data(self):
+        """Return the current session's reps as the list of dicts saved in the session file"""
+        return [
+            {
+                "time": rep_time,
+                "timestamp": datetime.datetime.fromtimestamp(ts).isoformat(),
+                "form_quality": None if np.isnan(quality) else quality
+            }
+            for rep_time, ts, quality in self.rep_buffer[:self.rep_count].tolist()
+        ]
+    
     def add_feedback(self, feedback_text, severity="info"):
         """Add feedback to the current session"""
         if not self.current_exercise:
             return False
             
-        feedback_info = {
-            "text": feedback_text,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "severity": severity  # info, warning, error
-        }
-        
-        self.feedback_data.append(feedback_info)
+        # Keep the raw epoch time; ISO strings are only formatted at end_session
+        self.feedback_data.append((feedback_text, time.time(), severity))  # severity: info, warning, error
         return True
     
+    def get_feedback_data(self):
+        """Return the current session's feedback as the list of dicts saved in the session file"""
+        return [
+            {
+                "text": text,
+                "timestamp": datetime.datetime.fromtimestamp(ts).isoformat(),
+                "severity": severity
+            }
+            for text, ts, severity in self.feedback_data
+        ]
+    
     def end_session(self, video_path=None):
         """End the current workout session and save all data"""
         if not self.current_exercise:
@@ -115,6 +296,7 @@ class WorkoutSession:
             
         self.session_end_time = datetime.datetime.now()
         self.video_path = video_path
+        rep_data = self.get_rep_data()
         
         # Create session summary
         session_summary = {
@@ -122,9 +304,9 @@ class WorkoutSession:
             "start_time": self.session_start_time.isoformat(),
             "end_time": self.session_end_time.isoformat(),
             "duration": (self.session_end_time - self.session_start_time).total_seconds(),
-            "reps": len(self.rep_data),
-            "rep_data": self.rep_data,
-            "feedback": self.feedback_data,
+            "reps": self.rep_count,
+            "rep_data": rep_data,
+            "feedback": self.get_feedback_data(),
             "video_path": self.video_path
         }
         
@@ -133,21 +315,30 @@ class WorkoutSession:
         
         # Save session to file
         session_file = os.path.join(self.sessions_dir, f"{session_id}.json")
-        with open(session_file, 'w') as f:
-            json.dump(session_summary, f, indent=2)
+        self.write_file_async(session_file, orjson.dumps(session_summary, option=orjson.OPT_INDENT_2))
         
         # Update user profile
         if self.current_exercise in self.profile["exercises"]:
+            # Loaded (or rebuilt) before this session joins the profile, so it is counted once
+            self.add_rep_distribution(self.current_exercise, self.rep_buffer['time'][:self.rep_count])
+            
             current_max = self.profile["exercises"][self.current_exercise]["max_reps"]
-            if len(self.rep_data) > current_max:
-                self.profile["exercises"][self.current_exercise]["max_reps"] = len(self.rep_data)
+            if self.rep_count > current_max:
+                self.profile["exercises"][self.current_exercise]["max_reps"] = self.rep_count
             
             # Add session reference
-            self.profile["exercises"][self.current_exercise]["sessions"].append({
+            sessions = self.profile["exercises"][self.current_exercise]["sessions"]
+            session_ref = {
                 "id": session_id,
                 "date": self.session_start_time.isoformat(),
-                "reps": len(self.rep_data)
-            })
+                "reps": self.rep_count
+            }
+            sessions.append(session_ref)
+            self.append_file_async(self.sessions_log_path,
+                                   orjson.dumps({"exercise": self.current_exercise, **session_ref}) + b"\n")
+            # Sessions are appended in date order unless the clock went backwards
+            if len(sessions) > 1 and sessions[-2]["date"] > sessions[-1]["date"]:
+                sessions.sort(key=lambda x: x["date"])
             
             # Update difficulty level based on performance
             self.update_exercise_level()
@@ -162,7 +353,7 @@ class WorkoutSession:
         self.current_exercise = None
         self.session_start_time = None
         self.session_end_time = None
-        self.rep_data = []
+        self.rep_count = 0
         self.feedback_data = []
         
         return True, {
@@ -179,7 +370,8 @@ class WorkoutSession:
             return
             
         exercise = self.profile["exercises"][self.current_exercise]
-        reps = len(self.rep_data)
+        reps = self.rep_count
+        self.profile_version += 1
         
         # Simple level progression rules
         if self.current_exercise == "Push-Ups":
@@ -240,9 +432,9 @@ class WorkoutSession:
                 }
                 continue
                 
-            # Sort sessions by date
-            sorted_sessions = sorted(sessions, key=lambda x: x["date"], reverse=True)
-            recent_sessions = sorted_sessions[:last_n_sessions]
+            # Sessions are kept in date order, so the latest ones are at the end;
+            # only that tail is copied, however long the history gets
+            recent_sessions = sessions[max(len(sessions) - last_n_sessions, 0):][::-1]
             
             # Calculate progress metrics
             if len(recent_sessions) > 1:
@@ -271,6 +463,13 @@ class WorkoutSession:
     
     def get_recommendations(self):
         """Generate workout recommendations based on user's progress"""
+        # The recommendations only depend on the profile, so reuse them until it changes
+        if self.recommendations_version != self.profile_version:
+            self.recommendations = self.build_recommendations()
+            self.recommendations_version = self.profile_version
+        return list(self.recommendations)
+    
+    def build_recommendations(self):
         progress = self.generate_progress_report()
         recommendations = []
         
@@ -296,52 +495,36 @@ class WorkoutSession:
         if exercise_name not in self.profile["exercises"]:
             return None
             
-        # Collect rep times from all sessions
-        sessions = self.profile["exercises"][exercise_name]["sessions"]
-        session_ids = [s["id"] for s in sessions]
-        
-        all_rep_times = []
-        for session_id in session_ids:
-            session_file = os.path.join(self.sessions_dir, f"{session_id}.json")
-            if os.path.exists(session_file):
-                with open(session_file, 'r') as f:
-                    session_data = json.load(f)
-                    rep_times = [rep["time"] for rep in session_data.get("rep_data", [])]
-                    all_rep_times.extend(rep_times)
-        
-        if not all_rep_times:
+        # Rep times from all sessions, already rounded to 0.5 seconds and counted
+        bin_counts = self.get_rep_distribution(exercise_name)
+        bins = np.flatnonzero(bin_counts)
+        if not len(bins):
             return None
             
-        # Round to nearest 0.5 second
-        rounded_times = [round(t * 2) / 2 for t in all_rep_times]
-        
-        # Count occurrences
-        time_counts = {}
-        for t in rounded_times:
-            time_counts[t] = time_counts.get(t, 0) + 1
-            
-        # Create chart with improved styling
-        plt.figure(figsize=(10, 6))
-        plt.style.use('ggplot')  # Use a nicer style
-        
-        times = sorted(time_counts.keys())
-        counts = [time_counts[t] for t in times]
-        
-        # Create bars with custom styling
-        bars = plt.bar(times, counts, color='#3498db', width=0.4, alpha=0.8)
-        
-        # Add value labels on top of bars
-        for bar in bars:
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                    f'{int(height)}', ha='center', va='bottom')
-        
-        # Style the chart
-        plt.xlabel('Time (seconds)', fontsize=12)
-        plt.ylabel('Number of Reps', fontsize=12)
-        plt.title(f'Rep Time Distribution - {exercise_name}', fontsize=14, fontweight='bold')
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout()
+        times, counts = bins / 2, bin_counts[bins]
+            
+        with chart_lock:
+            # Create chart with improved styling
+            plt.style.use(CHART_STYLE)
+            fig, ax = get_chart_axes()
+            
+            # Create bars with custom styling
+            bars = ax.bar(times, counts, color='#3498db', width=0.4, alpha=0.8)
+            
+            # Add value labels on top of bars
+            for bar in bars:
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                        f'{int(height)}', ha='center', va='bottom')
+            
+            # Style the chart
+            ax.set_xlabel('Time (seconds)', fontsize=12)
+            ax.set_ylabel('Number of Reps', fontsize=12)
+            ax.set_title(f'Rep Time Distribution - {exercise_name}', fontsize=14, fontweight='bold')
+            ax.grid(axis='y', linestyle='--', alpha=0.7)
+            fig.tight_layout()
+            
+            buffer = render_chart_png(fig)
         
         if as_file:
             # Save to file
@@ -350,17 +533,14 @@ class WorkoutSession:
             
             filename = f"{exercise_name.replace(' ', '_')}_distribution.png"
             filepath = os.path.join(chart_dir, filename)
-            plt.savefig(filepath, dpi=100)
-            plt.close()
+            
+            # The chart is rendered above; only the file write goes to the I/O thread
+            self.write_file_async(filepath, buffer.getvalue())
             
             return filepath
         else:
-            # Save to memory
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=100)
+            # Return the image in memory
             buffer.seek(0)
-            plt.close()
-            
             return buffer
     
     def generate_progress_chart(self, exercise_name, as_file=False):
@@ -374,32 +554,35 @@ class WorkoutSession:
         if not sessions:
             return None
             
-        # Sort sessions by date
-        sorted_sessions = sorted(sessions, key=lambda x: x["date"])
+        # Sessions are already kept in date order
+        sorted_sessions = sessions
         
         # Extract dates and rep counts
         dates = [datetime.datetime.fromisoformat(s["date"]) for s in sorted_sessions]
         rep_counts = [s["reps"] for s in sorted_sessions]
         
-        # Create chart with improved styling
-        plt.figure(figsize=(10, 6))
-        plt.style.use('ggplot')  # Use a nicer style
-        
-        # Plot line chart with markers
-        plt.plot(dates, rep_counts, marker='o', markersize=8, 
-                linestyle='-', linewidth=2, color='#3498db')
-        
-        # Add value labels above each point
-        for i, (date, count) in enumerate(zip(dates, rep_counts)):
-            plt.text(date, count + 0.5, str(count), ha='center', va='bottom')
-        
-        # Style the chart
-        plt.xlabel('Date', fontsize=12)
-        plt.ylabel('Reps Completed', fontsize=12)
-        plt.title(f'Progress Over Time - {exercise_name}', fontsize=14, fontweight='bold')
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+        with chart_lock:
+            # Create chart with improved styling
+            plt.style.use(CHART_STYLE)
+            fig, ax = get_chart_axes()
+            
+            # Plot line chart with markers
+            ax.plot(dates, rep_counts, marker='o', markersize=8, 
+                    linestyle='-', linewidth=2, color='#3498db')
+            
+            # Add value labels above each point
+            for i, (date, count) in enumerate(zip(dates, rep_counts)):
+                ax.text(date, count + 0.5, str(count), ha='center', va='bottom')
+            
+            # Style the chart
+            ax.set_xlabel('Date', fontsize=12)
+            ax.set_ylabel('Reps Completed', fontsize=12)
+            ax.set_title(f'Progress Over Time - {exercise_name}', fontsize=14, fontweight='bold')
+            ax.grid(True, linestyle='--', alpha=0.7)
+            plt.setp(ax.get_xticklabels(), rotation=45)
+            fig.tight_layout()
+            
+            buffer = render_chart_png(fig)
         
         if as_file:
             # Save to file
@@ -408,15 +591,12 @@ class WorkoutSession:
             
             filename = f"{exercise_name.replace(' ', '_')}_progress.png"
             filepath = os.path.join(chart_dir, filename)
-            plt.savefig(filepath, dpi=100)
-            plt.close()
+            
+            # The chart is rendered above; only the file write goes to the I/O thread
+            self.write_file_async(filepath, buffer.getvalue())
             
             return filepath
         else:
-            # Save to memory
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=100)
+            # Return the image in memory
             buffer.seek(0)
-            plt.close()
-            
             return buffer
\ No newline at end of file
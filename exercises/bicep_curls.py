@@ -4,8 +4,25 @@ import mediapipe as mp
 import math
 import time
 import numpy as np
-from collections import defaultdict
-from core.pose_detector import PoseDetector
+from core.rep_times import rep_time_intervals
+from core.pose_detector import PoseDetector, darken_info_bar, LM_X, LM_Y, LM_VISIBILITY
+
+def curl_angles(sx, sy, ex, ey, wx, wy, hx, hy):
+    """
+    Compute the elbow angle (shoulder-elbow-wrist) and the elbow-to-body angle
+    (between shoulder->elbow and shoulder->hip) from plain floats in one call.
+    The elbow angle uses the same arithmetic as PoseDetector.calculate_angle; the
+    elbow-to-body angle is atan2(|cross|, dot), which stays accurate for nearly
+    parallel vectors and gives 0 for a zero vector.
+    """
+    radians = math.atan2(wy - ey, wx - ex) - math.atan2(sy - ey, sx - ex)
+    elbow_angle = abs(radians * 180.0 / math.pi)
+    if elbow_angle > 180:
+        elbow_angle = 360 - elbow_angle
+        
+    se_x, se_y = ex - sx, ey - sy
+    sh_x, sh_y = hx - sx, hy - sy
+    return elbow_angle, math.degrees(math.atan2(abs(se_x*sh_y - se_y*sh_x), se_x*sh_x + se_y*sh_y))
 
 class BicepCurlTracker:
     # Constants based on scientific measurements for proper form
@@ -13,9 +30,15 @@ class BicepCurlTracker:
     ELBOW_CONTRACT_THRESHOLD = 45  # For a proper curl, the lowest elbow angle must drop below this
     MIN_DROP = 10               # Minimal drop to start rep
     ELBOW_BODY_ANGLE_THRESHOLD = 15  # Elbow-to-body must be less than 15°
+    # Arc colors by curl depth: good (<= ELBOW_CONTRACT_THRESHOLD), moderate (<= 90°), insufficient
+    ARC_COLORS = ((0, 255, 0), (0, 165, 255), (0, 0, 255))
+    
+    # Shoulder, elbow, wrist and hip landmark indices for each arm
+    LEFT_ARM = [PoseDetector.LEFT_SHOULDER, PoseDetector.LEFT_ELBOW, PoseDetector.LEFT_WRIST, PoseDetector.LEFT_HIP]
+    RIGHT_ARM = [PoseDetector.RIGHT_SHOULDER, PoseDetector.RIGHT_ELBOW, PoseDetector.RIGHT_WRIST, PoseDetector.RIGHT_HIP]
 
-    def __init__(self):
-        self.detector = PoseDetector()
+    def __init__(self, use_gpu=None):
+        self.detector = PoseDetector(use_gpu=use_gpu)
         self.rep_count = 0
         self.in_rep = False
         self.baseline = None
@@ -23,16 +46,16 @@ class BicepCurlTracker:
         self.improper_flag = False
         self.start_time = None
         self.last_wait_time = 0
-        self.rep_times = []
+        # Completed rep times live in a preallocated array that doubles when full
+        self.rep_time_buffer = np.empty(256)
+        self.rep_time_count = 0
         self.feedback_history = []
         self.last_feedback = "Waiting for user..."
-        self.rep_time_intervals = defaultdict(int)
         self.current_rep_start_time = None
 
-    def track(self, frame):
-        original_frame = frame.copy()
-        results = self.detector.process_frame(frame)
-        current_time = time.time()
+    def track(self, frame, draw=True):
+        results = self.detector.process_frame(frame, draw=draw)
+        current_time = time.monotonic()
         
         if not (results and results.pose_landmarks):
             feedback = ""
@@ -42,22 +65,14 @@ class BicepCurlTracker:
                 self.last_feedback = feedback
             return frame, self.last_feedback, self.rep_count, 0
 
-        landmarks = results.pose_landmarks.landmark
+        # The detector's per-frame landmark array, read as plain floats instead of
+        # going through the protobuf objects attribute by attribute
+        lm = self.detector.landmark_array
+        visibility = lm[:, LM_VISIBILITY]
 
         # Check visibility for both arms
-        left_available = (
-            landmarks[self.detector.LEFT_SHOULDER].visibility > 0.5 and
-            landmarks[self.detector.LEFT_ELBOW].visibility > 0.5 and
-            landmarks[self.detector.LEFT_WRIST].visibility > 0.5 and
-            landmarks[self.detector.LEFT_HIP].visibility > 0.5
-        )
-        
-        right_available = (
-            landmarks[self.detector.RIGHT_SHOULDER].visibility > 0.5 and
-            landmarks[self.detector.RIGHT_ELBOW].visibility > 0.5 and
-            landmarks[self.detector.RIGHT_WRIST].visibility > 0.5 and
-            landmarks[self.detector.RIGHT_HIP].visibility > 0.5
-        )
+        left_available = bool(visibility[self.LEFT_ARM].min() > 0.5)
+        right_available = bool(visibility[self.RIGHT_ARM].min() > 0.5)
 
         if not (left_available or right_available):
             feedback = "Waiting for user..."
@@ -67,29 +82,14 @@ class BicepCurlTracker:
             return frame, self.last_feedback, self.rep_count, 0
 
         # Prefer left side if available
-        if left_available:
-            shoulder = landmarks[self.detector.LEFT_SHOULDER]
-            elbow = landmarks[self.detector.LEFT_ELBOW]
-            wrist = landmarks[self.detector.LEFT_WRIST]
-            hip = landmarks[self.detector.LEFT_HIP]
-            side = "left"
-        else:
-            shoulder = landmarks[self.detector.RIGHT_SHOULDER]
-            elbow = landmarks[self.detector.RIGHT_ELBOW]
-            wrist = landmarks[self.detector.RIGHT_WRIST]
-            hip = landmarks[self.detector.RIGHT_HIP]
-            side = "right"
+        arm = self.LEFT_ARM if left_available else self.RIGHT_ARM
+        (sx, sy), (ex, ey), (wx, wy), (hx, hy) = lm[arm, LM_X:LM_Y + 1].tolist()
 
         if self.last_feedback == "Waiting for user...":
             self.last_feedback = "Begin exercise."
             
-        # Calculate the current elbow angle
-        current_elbow_angle = self.detector.calculate_angle(shoulder, elbow, wrist)
-        
-        # Calculate elbow-to-body angle
-        vec_SE = [elbow.x - shoulder.x, elbow.y - shoulder.y]
-        vec_SH = [hip.x - shoulder.x, hip.y - shoulder.y]
-        elbow_body_angle = self.calculate_vector_angle(vec_SE, vec_SH)
+        # Calculate the current elbow angle and the elbow-to-body angle
+        current_elbow_angle, elbow_body_angle = curl_angles(sx, sy, ex, ey, wx, wy, hx, hy)
         
         # Update baseline if arm is fully extended
         if current_elbow_angle > self.EXTENDED_THRESHOLD:
@@ -133,9 +133,10 @@ class BicepCurlTracker:
                     feedback = " ".join(issues)
                 else:
                     self.rep_count += 1
-                    rounded_time = round(rep_time * 2) / 2
-                    self.rep_time_intervals[rounded_time] += 1
-                    self.rep_times.append(rep_time)
+                    if self.rep_time_count == len(self.rep_time_buffer):
+                        self.rep_time_buffer = np.resize(self.rep_time_buffer, 2 * len(self.rep_time_buffer))
+                    self.rep_time_buffer[self.rep_time_count] = rep_time
+                    self.rep_time_count += 1
                     
                 # Reset for next rep
                 self.in_rep = False
@@ -149,39 +150,32 @@ class BicepCurlTracker:
             if not feedback.startswith("Waiting"):
                 self.feedback_history.append(feedback)
         
-        # Draw additional visual cues on the frame
-        self.draw_visual_feedback(frame, landmarks, current_elbow_angle, side, elbow_body_angle)
-        
-        # Overlay information on the frame
-        self.draw_info_overlay(frame)
+        if draw:
+            # Draw additional visual cues on the frame
+            self.draw_visual_feedback(frame, ((sx, sy), (ex, ey), (wx, wy)), current_elbow_angle, elbow_body_angle, current_time)
+            
+            # Overlay information on the frame
+            self.draw_info_overlay(frame)
         
         return frame, self.last_feedback, self.rep_count, rep_time
     
-    def draw_visual_feedback(self, frame, landmarks, current_elbow_angle, side, elbow_body_angle):
+    def draw_visual_feedback(self, frame, arm_points, current_elbow_angle, elbow_body_angle, current_time):
         """Draw visual feedback elements on the frame"""
         h, w, _ = frame.shape
         
-        # Draw elbow angle arc
-        if side == "left":
-            shoulder = landmarks[self.detector.LEFT_SHOULDER]
-            elbow = landmarks[self.detector.LEFT_ELBOW]
-            wrist = landmarks[self.detector.LEFT_WRIST]
-        else:
-            shoulder = landmarks[self.detector.RIGHT_SHOULDER]
-            elbow = landmarks[self.detector.RIGHT_ELBOW]
-            wrist = landmarks[self.detector.RIGHT_WRIST]
-            
-        # Convert normalized coordinates to pixel coordinates
-        shoulder_px = (int(shoulder.x * w), int(shoulder.y * h))
-        elbow_px = (int(elbow.x * w), int(elbow.y * h))
-        wrist_px = (int(wrist.x * w), int(wrist.y * h))
+        # Draw elbow angle arc from the tracked arm's normalized
+        # (shoulder, elbow, wrist) coordinates, converted to pixel coordinates
+        (sx, sy), (ex, ey), (wx, wy) = arm_points
+        shoulder_px = (int(sx * w), int(sy * h))
+        elbow_px = (int(ex * w), int(ey * h))
+        wrist_px = (int(wx * w), int(wy * h))
         
         # Draw elbow angle arc
         self.draw_angle_arc(frame, shoulder_px, elbow_px, wrist_px, current_elbow_angle)
         
         # Draw rep timing indicator if in a rep
         if self.in_rep and self.current_rep_start_time:
-            current_duration = time.time() - self.current_rep_start_time
+            current_duration = current_time - self.current_rep_start_time
             # Draw a timer box at the top of the frame
             timer_width = int(min(current_duration * 50, w-40))  # Scale timer width by duration
             cv2.rectangle(frame, (20, 20), (20 + timer_width, 40), (0, 255, 0), -1)
@@ -208,46 +202,44 @@ class BicepCurlTracker:
     
     def draw_angle_arc(self, frame, point1, point2, point3, angle):
         """Draw an arc showing the angle between three points"""
-        # Calculate vectors
-        vec1 = np.array([point1[0] - point2[0], point1[1] - point2[1]])
-        vec2 = np.array([point3[0] - point2[0], point3[1] - point2[1]])
+        # Calculate vectors; they are 2D, so scalar math avoids NumPy's per-call overhead
+        dx1, dy1 = point1[0] - point2[0], point1[1] - point2[1]
+        dx2, dy2 = point3[0] - point2[0], point3[1] - point2[1]
+        norm1 = math.sqrt(dx1*dx1 + dy1*dy1)
+        norm2 = math.sqrt(dx2*dx2 + dy2*dy2)
+        if norm1 == 0 or norm2 == 0:
+            return  # Coincident points, no angle to draw
         
         # Normalize vectors
-        vec1_norm = vec1 / np.linalg.norm(vec1)
-        vec2_norm = vec2 / np.linalg.norm(vec2)
+        ux1, uy1 = dx1 / norm1, dy1 / norm1
+        ux2, uy2 = dx2 / norm2, dy2 / norm2
         
         # Calculate the angle in radians
-        cos_angle = np.clip(np.dot(vec1_norm, vec2_norm), -1.0, 1.0)
-        angle_rad = np.arccos(cos_angle)
+        cos_angle = max(min(ux1*ux2 + uy1*uy2, 1.0), -1.0)
+        angle_rad = math.acos(cos_angle)
         
         # Determine the direction of the arc (clockwise or counterclockwise)
-        cross_product = np.cross([vec1_norm[0], vec1_norm[1], 0], [vec2_norm[0], vec2_norm[1], 0])
-        if cross_product[2] < 0:
-            angle_rad = 2 * np.pi - angle_rad
+        if ux1*uy2 - uy1*ux2 < 0:
+            angle_rad = 2 * math.pi - angle_rad
         
         # Calculate the start angle
-        start_angle = np.arctan2(vec1[1], vec1[0])
+        start_angle = math.atan2(dy1, dx1)
         
         # Set arc properties
-        radius = min(int(np.linalg.norm(vec1) * 0.3), int(np.linalg.norm(vec2) * 0.3))
+        radius = min(int(norm1 * 0.3), int(norm2 * 0.3))
         radius = max(radius, 20)  # Minimum radius
         
-        # Determine color based on angle
-        if angle <= self.ELBOW_CONTRACT_THRESHOLD:
-            color = (0, 255, 0)  # Green for good curl
-        elif angle <= 90:
-            color = (0, 165, 255)  # Orange for moderate curl
-        else:
-            color = (0, 0, 255)  # Red for insufficient curl
+        # Green for a good curl, orange for moderate, red for insufficient
+        color = self.ARC_COLORS[(angle > self.ELBOW_CONTRACT_THRESHOLD) + (angle > 90)]
             
         # Draw the arc
         cv2.ellipse(frame, point2, (radius, radius), 
-                  np.degrees(start_angle), 0, np.degrees(angle_rad), color, 3)
+                  math.degrees(start_angle), 0, math.degrees(angle_rad), color, 3)
         
         # Add the angle text
         text_angle = start_angle + angle_rad / 2
-        text_x = int(point2[0] + (radius + 20) * np.cos(text_angle))
-        text_y = int(point2[1] + (radius + 20) * np.sin(text_angle))
+        text_x = int(point2[0] + (radius + 20) * math.cos(text_angle))
+        text_y = int(point2[1] + (radius + 20) * math.sin(text_angle))
         
         cv2.putText(frame, f"{int(angle)}°", (text_x, text_y), 
                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
@@ -256,10 +248,8 @@ class BicepCurlTracker:
         """Draw general information overlay on the frame"""
         h, w, _ = frame.shape
         
-        # Create a semi-transparent overlay for the top info bar
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (w, 100), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # Darken the top info bar
+        darken_info_bar(frame)
         
         # Draw exercise info and rep count
         font = cv2.FONT_HERSHEY_SIMPLEX
@@ -271,27 +261,22 @@ class BicepCurlTracker:
         # Draw feedback message
         cv2.putText(frame, self.last_feedback, (20, 80), font, 0.7, (255, 255, 255), 2)
         
-    def calculate_vector_angle(self, v1, v2):
-        """Calculate the angle (in degrees) between two 2D vectors v1 and v2."""
-        dot = v1[0]*v2[0] + v1[1]*v2[1]
-        mag1 = math.sqrt(v1[0]**2 + v1[1]**2)
-        mag2 = math.sqrt(v2[0]**2 + v2[1]**2)
-        if mag1 == 0 or mag2 == 0:
-            return 0
-        cos_val = dot / (mag1 * mag2)
-        cos_val = max(min(cos_val, 1.0), -1.0)
-        return math.degrees(math.acos(cos_val))
-        
+    @property
+    def rep_times(self):
+        return self.rep_time_buffer[:self.rep_time_count]
+
     def get_session_summary(self):
+        rep_times = self.rep_times
+        
         # Calculate average rep time
         avg_rep_time = 0
-        if self.rep_times:
-            avg_rep_time = sum(self.rep_times) / len(self.rep_times)
+        if self.rep_time_count:
+            avg_rep_time = float(rep_times.mean())
             
         return {
             "total_reps": self.rep_count,
-            "rep_times": self.rep_times,
+            "rep_times": rep_times.tolist(),
             "average_rep_time": avg_rep_time,
             "feedback": self.feedback_history,
-            "rep_time_intervals": dict(self.rep_time_intervals)
+            "rep_time_intervals": rep_time_intervals(rep_times)
         }
\ No newline at end of file
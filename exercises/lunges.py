@@ -4,8 +4,8 @@ import mediapipe as mp
 import math
 import time
 import numpy as np
-from collections import defaultdict
-from core.pose_detector import PoseDetector
+from core.rep_times import rep_time_intervals
+from core.pose_detector import PoseDetector, darken_info_bar, calculate_angle_xy, LM_X, LM_Y, LM_VISIBILITY
 
 class LungeTracker:
     # Constants based on scientific measurements for proper form
@@ -15,9 +15,17 @@ class LungeTracker:
     FRONT_KNEE_ALIGNMENT = 0.10    # Front knee should not go beyond toes
     TORSO_VERTICAL_THRESHOLD = 20  # Torso should remain relatively vertical
     MIN_KNEE_DROP = 20             # Minimal knee angle change to start a rep
+    # Landmarks that must be visible; also every point the rep logic reads
+    REQUIRED = [
+        PoseDetector.LEFT_SHOULDER, PoseDetector.RIGHT_SHOULDER,
+        PoseDetector.LEFT_HIP, PoseDetector.RIGHT_HIP,
+        PoseDetector.LEFT_KNEE, PoseDetector.RIGHT_KNEE,
+        PoseDetector.LEFT_ANKLE, PoseDetector.RIGHT_ANKLE,
+        PoseDetector.LEFT_FOOT_INDEX, PoseDetector.RIGHT_FOOT_INDEX
+    ]
 
-    def __init__(self):
-        self.detector = PoseDetector()
+    def __init__(self, use_gpu=None):
+        self.detector = PoseDetector(use_gpu=use_gpu)
         self.rep_count = 0
         self.in_lunge = False
         self.starting_knee_angle = None       # Baseline knee angle when standing
@@ -32,13 +40,11 @@ class LungeTracker:
         self.rep_times = []
         self.feedback_history = []
         self.last_feedback = "Waiting for user..."
-        self.rep_time_intervals = defaultdict(int)
         self.current_rep_start_time = None
 
-    def track(self, frame):
-        original_frame = frame.copy()
-        results = self.detector.process_frame(frame)
-        current_time = time.time()
+    def track(self, frame, draw=True):
+        results = self.detector.process_frame(frame, draw=draw)
+        current_time = time.monotonic()
         
         if not (results and results.pose_landmarks):
             feedback = ""
@@ -48,18 +54,12 @@ class LungeTracker:
                 self.last_feedback = feedback
             return frame, self.last_feedback, self.rep_count, 0
 
-        landmarks = results.pose_landmarks.landmark
+        # The detector's per-frame landmark array: one gather gives every point
+        # the rep logic needs as plain floats
+        required = self.detector.landmark_array[self.REQUIRED]
         
         # Check visibility of required landmarks
-        required = [
-            self.detector.LEFT_SHOULDER, self.detector.RIGHT_SHOULDER,
-            self.detector.LEFT_HIP, self.detector.RIGHT_HIP,
-            self.detector.LEFT_KNEE, self.detector.RIGHT_KNEE,
-            self.detector.LEFT_ANKLE, self.detector.RIGHT_ANKLE,
-            self.detector.LEFT_FOOT_INDEX, self.detector.RIGHT_FOOT_INDEX
-        ]
-        
-        if not all(landmarks[idx].visibility > 0.5 for idx in required):
+        if not required[:, LM_VISIBILITY].min() > 0.5:
             feedback = "Waiting for user... (full body must be visible)"
             if current_time - self.last_wait_time >= 5:
                 self.last_wait_time = current_time
@@ -69,47 +69,35 @@ class LungeTracker:
         if self.last_feedback.startswith("Waiting for user"):
             self.last_feedback = "Begin exercise."
             
+        points = required[:, LM_X:LM_Y + 1].tolist()
+        (left_shoulder, right_shoulder, left_hip, right_hip, left_knee, right_knee,
+         left_ankle, right_ankle, left_foot, right_foot) = points
+            
         # Detect which leg is forward based on feet position
-        left_foot_y = landmarks[self.detector.LEFT_FOOT_INDEX].y
-        right_foot_y = landmarks[self.detector.RIGHT_FOOT_INDEX].y
+        left_foot_y = left_foot[1]
+        right_foot_y = right_foot[1]
         
         front_side = 'left' if left_foot_y < right_foot_y else 'right'
         back_side = 'right' if front_side == 'left' else 'left'
         
         # Calculate knee angles
-        left_knee_angle = self.detector.calculate_angle(
-            landmarks[self.detector.LEFT_HIP],
-            landmarks[self.detector.LEFT_KNEE],
-            landmarks[self.detector.LEFT_ANKLE]
-        )
-        
-        right_knee_angle = self.detector.calculate_angle(
-            landmarks[self.detector.RIGHT_HIP],
-            landmarks[self.detector.RIGHT_KNEE],
-            landmarks[self.detector.RIGHT_ANKLE]
-        )
+        left_knee_angle = calculate_angle_xy(left_hip, left_knee, left_ankle)
+        right_knee_angle = calculate_angle_xy(right_hip, right_knee, right_ankle)
         
         # Assign front and back knee angles
         front_knee_angle = left_knee_angle if front_side == 'left' else right_knee_angle
         back_knee_angle = right_knee_angle if front_side == 'left' else left_knee_angle
         
         # Calculate torso angle (spine from vertical)
-        left_shoulder_hip = self.calculate_vertical_angle(
-            [landmarks[self.detector.LEFT_SHOULDER].x, landmarks[self.detector.LEFT_SHOULDER].y],
-            [landmarks[self.detector.LEFT_HIP].x, landmarks[self.detector.LEFT_HIP].y]
-        )
-        
-        right_shoulder_hip = self.calculate_vertical_angle(
-            [landmarks[self.detector.RIGHT_SHOULDER].x, landmarks[self.detector.RIGHT_SHOULDER].y],
-            [landmarks[self.detector.RIGHT_HIP].x, landmarks[self.detector.RIGHT_HIP].y]
-        )
+        left_shoulder_hip = self.calculate_vertical_angle(left_shoulder, left_hip)
+        right_shoulder_hip = self.calculate_vertical_angle(right_shoulder, right_hip)
         
         torso_angle = (left_shoulder_hip + right_shoulder_hip) / 2
         
         # Check knee alignment (front knee should not go beyond toes)
-        front_knee = landmarks[self.detector.LEFT_KNEE] if front_side == 'left' else landmarks[self.detector.RIGHT_KNEE]
-        front_ankle = landmarks[self.detector.LEFT_ANKLE] if front_side == 'left' else landmarks[self.detector.RIGHT_ANKLE]
-        knee_over_toes = front_knee.x > front_ankle.x + self.FRONT_KNEE_ALIGNMENT
+        front_knee = left_knee if front_side == 'left' else right_knee
+        front_ankle = left_ankle if front_side == 'left' else right_ankle
+        knee_over_toes = front_knee[0] > front_ankle[0] + self.FRONT_KNEE_ALIGNMENT
         
         # Update tracking if not in a lunge and both knees are straight
         if not self.in_lunge and left_knee_angle > self.STANDING_KNEE_THRESHOLD and right_knee_angle > self.STANDING_KNEE_THRESHOLD:
@@ -174,8 +162,6 @@ class LungeTracker:
                     feedback = " ".join(issues)
                 else:
                     self.rep_count += 1
-                    rounded_time = round(rep_time * 2) / 2
-                    self.rep_time_intervals[rounded_time] += 1
                     self.rep_times.append(rep_time)
                     
                     # Check if alternating legs properly
@@ -196,50 +182,33 @@ class LungeTracker:
             if not feedback.startswith("Waiting"):
                 self.feedback_history.append(feedback)
         
-        # Draw additional visual cues on the frame
-        self.draw_visual_feedback(frame, landmarks, front_side, front_knee_angle, back_knee_angle, torso_angle, knee_over_toes)
-        
-        # Overlay information on the frame
-        self.draw_info_overlay(frame)
+        if draw:
+            # Draw additional visual cues on the frame
+            self.draw_visual_feedback(frame, points, front_side, front_knee_angle, back_knee_angle, torso_angle, knee_over_toes, current_time)
+            
+            # Overlay information on the frame
+            self.draw_info_overlay(frame)
                 
         return frame, self.last_feedback, self.rep_count, rep_time
     
-    def draw_visual_feedback(self, frame, landmarks, front_side, front_knee_angle, back_knee_angle, torso_angle, knee_over_toes):
-        """Draw visual feedback elements on the frame"""
+    def draw_visual_feedback(self, frame, points, front_side, front_knee_angle, back_knee_angle, torso_angle, knee_over_toes, current_time):
+        """
+        Draw visual feedback elements on the frame.
+        points holds the normalized (x, y) of the REQUIRED landmarks, in that order.
+        """
         h, w, _ = frame.shape
         
+        # Convert normalized coordinates to pixel coordinates
+        (_, _, left_hip_px, right_hip_px, left_knee_px, right_knee_px,
+         left_ankle_px, right_ankle_px, left_foot_px, right_foot_px) = [(int(x * w), int(y * h)) for x, y in points]
+        
         # Define sides
         if front_side == 'left':
-            front_hip = landmarks[self.detector.LEFT_HIP]
-            front_knee = landmarks[self.detector.LEFT_KNEE]
-            front_ankle = landmarks[self.detector.LEFT_ANKLE]
-            front_foot = landmarks[self.detector.LEFT_FOOT_INDEX]
-            
-            back_hip = landmarks[self.detector.RIGHT_HIP]
-            back_knee = landmarks[self.detector.RIGHT_KNEE]
-            back_ankle = landmarks[self.detector.RIGHT_ANKLE]
-            back_foot = landmarks[self.detector.RIGHT_FOOT_INDEX]
+            front_hip_px, front_knee_px, front_ankle_px, front_foot_px = left_hip_px, left_knee_px, left_ankle_px, left_foot_px
+            back_hip_px, back_knee_px, back_ankle_px, back_foot_px = right_hip_px, right_knee_px, right_ankle_px, right_foot_px
         else:
-            front_hip = landmarks[self.detector.RIGHT_HIP]
-            front_knee = landmarks[self.detector.RIGHT_KNEE]
-            front_ankle = landmarks[self.detector.RIGHT_ANKLE]
-            front_foot = landmarks[self.detector.RIGHT_FOOT_INDEX]
-            
-            back_hip = landmarks[self.detector.LEFT_HIP]
-            back_knee = landmarks[self.detector.LEFT_KNEE]
-            back_ankle = landmarks[self.detector.LEFT_ANKLE]
-            back_foot = landmarks[self.detector.LEFT_FOOT_INDEX]
-            
-        # Convert normalized coordinates to pixel coordinates
-        front_hip_px = (int(front_hip.x * w), int(front_hip.y * h))
-        front_knee_px = (int(front_knee.x * w), int(front_knee.y * h))
-        front_ankle_px = (int(front_ankle.x * w), int(front_ankle.y * h))
-        front_foot_px = (int(front_foot.x * w), int(front_foot.y * h))
-        
-        back_hip_px = (int(back_hip.x * w), int(back_hip.y * h))
-        back_knee_px = (int(back_knee.x * w), int(back_knee.y * h))
-        back_ankle_px = (int(back_ankle.x * w), int(back_ankle.y * h))
-        back_foot_px = (int(back_foot.x * w), int(back_foot.y * h))
+            front_hip_px, front_knee_px, front_ankle_px, front_foot_px = right_hip_px, right_knee_px, right_ankle_px, right_foot_px
+            back_hip_px, back_knee_px, back_ankle_px, back_foot_px = left_hip_px, left_knee_px, left_ankle_px, left_foot_px
         
         # Draw knee angle arcs
         self.draw_angle_arc(frame, front_hip_px, front_knee_px, front_ankle_px, front_knee_angle, "front_knee")
@@ -264,11 +233,11 @@ class LungeTracker:
                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
         
         # Draw torso vertical reference
-        self.draw_torso_reference(frame, landmarks, torso_angle)
+        self.draw_torso_reference(frame, points, torso_angle)
         
         # Draw rep timing indicator if in a lunge
         if self.in_lunge and self.current_rep_start_time:
-            current_duration = time.time() - self.current_rep_start_time
+            current_duration = current_time - self.current_rep_start_time
             # Draw a timer box at the top of the frame
             timer_width = int(min(current_duration * 50, w-40))  # Scale timer width by duration
             cv2.rectangle(frame, (20, 20), (20 + timer_width, 40), (0, 255, 0), -1)
@@ -357,16 +326,18 @@ class LungeTracker:
         cv2.putText(frame, f"{int(angle)}°", (text_x, text_y), 
                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
     
-    def draw_torso_reference(self, frame, landmarks, torso_angle):
+    def draw_torso_reference(self, frame, points, torso_angle):
         """Draw a vertical reference to check torso alignment"""
         h, w, _ = frame.shape
+        (left_shoulder_x, left_shoulder_y), (right_shoulder_x, right_shoulder_y), \
+            (left_hip_x, left_hip_y), (right_hip_x, right_hip_y) = points[:4]
         
         # Average shoulders and hips to get torso midpoints
-        mid_shoulder_x = (landmarks[self.detector.LEFT_SHOULDER].x + landmarks[self.detector.RIGHT_SHOULDER].x) / 2
-        mid_shoulder_y = (landmarks[self.detector.LEFT_SHOULDER].y + landmarks[self.detector.RIGHT_SHOULDER].y) / 2
+        mid_shoulder_x = (left_shoulder_x + right_shoulder_x) / 2
+        mid_shoulder_y = (left_shoulder_y + right_shoulder_y) / 2
         
-        mid_hip_x = (landmarks[self.detector.LEFT_HIP].x + landmarks[self.detector.RIGHT_HIP].x) / 2
-        mid_hip_y = (landmarks[self.detector.LEFT_HIP].y + landmarks[self.detector.RIGHT_HIP].y) / 2
+        mid_hip_x = (left_hip_x + right_hip_x) / 2
+        mid_hip_y = (left_hip_y + right_hip_y) / 2
         
         # Convert to pixel coordinates
         mid_shoulder_px = (int(mid_shoulder_x * w), int(mid_shoulder_y * h))
@@ -376,15 +347,19 @@ class LungeTracker:
         vertical_x = mid_shoulder_px[0]
         vertical_bottom = (vertical_x, mid_hip_px[1])
         
-        # Draw dashed vertical reference line
+        # Draw dashed vertical reference line, all dashes in one cv2.polylines call
         dash_length = 10
         gap_length = 5
         y_start = mid_shoulder_px[1]
         y_end = mid_hip_px[1]
         
-        for y in range(y_start, y_end, dash_length + gap_length):
-            y2 = min(y + dash_length, y_end)
-            cv2.line(frame, (vertical_x, y), (vertical_x, y2), (255, 255, 255), 1)
+        dash_starts = np.arange(y_start, y_end, dash_length + gap_length, dtype=np.int32)
+        if len(dash_starts):
+            dashes = np.empty((len(dash_starts), 2, 2), dtype=np.int32)
+            dashes[:, :, 0] = vertical_x
+            dashes[:, 0, 1] = dash_starts
+            dashes[:, 1, 1] = np.minimum(dash_starts + dash_length, y_end)
+            cv2.polylines(frame, dashes, False, (255, 255, 255), 1)
         
         # Draw actual torso line
         torso_color = (0, 255, 0) if torso_angle <= self.TORSO_VERTICAL_THRESHOLD else (0, 0, 255)
@@ -399,10 +374,8 @@ class LungeTracker:
         """Draw general information overlay on the frame"""
         h, w, _ = frame.shape
         
-        # Create a semi-transparent overlay for the top info bar
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (w, 100), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # Darken the top info bar
+        darken_info_bar(frame)
         
         # Draw exercise info and rep count
         font = cv2.FONT_HERSHEY_SIMPLEX
@@ -414,7 +387,8 @@ class LungeTracker:
         # Draw feedback message
         cv2.putText(frame, self.last_feedback, (20, 80), font, 0.7, (255, 255, 255), 2)
         
-    def calculate_vertical_angle(self, a, b):
+    @staticmethod
+    def calculate_vertical_angle(a, b):
         """Calculate the angle between a vector and the vertical axis."""
         dx = b[0] - a[0]
         dy = b[1] - a[1]
@@ -434,5 +408,5 @@ class LungeTracker:
             "rep_times": self.rep_times,
             "average_rep_time": avg_rep_time,
             "feedback": self.feedback_history,
-            "rep_time_intervals": dict(self.rep_time_intervals)
+            "rep_time_intervals": rep_time_intervals(self.rep_times)
         }
\ No newline at end of file
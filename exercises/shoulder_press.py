@@ -4,8 +4,8 @@ import mediapipe as mp
 import math
 import time
 import numpy as np
-from collections import defaultdict
-from core.pose_detector import PoseDetector
+from core.rep_times import rep_time_intervals
+from core.pose_detector import PoseDetector, darken_info_bar
 
 class ShoulderPressTracker:
     # Constants based on scientific measurements for proper form
@@ -28,13 +28,11 @@ class ShoulderPressTracker:
         self.rep_times = []
         self.feedback_history = []
         self.last_feedback = "Waiting for user..."
-        self.rep_time_intervals = defaultdict(int)
         self.current_rep_start_time = None
 
-    def track(self, frame):
-        original_frame = frame.copy()
-        results = self.detector.process_frame(frame)
-        current_time = time.time()
+    def track(self, frame, draw=True):
+        results = self.detector.process_frame(frame, draw=draw)
+        current_time = time.monotonic()
         
         if not (results and results.pose_landmarks):
             feedback = ""
@@ -148,8 +146,6 @@ class ShoulderPressTracker:
                     feedback = " ".join(issues)
                 else:
                     self.rep_count += 1
-                    rounded_time = round(rep_time * 2) / 2
-                    self.rep_time_intervals[rounded_time] += 1
                     self.rep_times.append(rep_time)
                     
                 # Reset for next rep
@@ -164,15 +160,16 @@ class ShoulderPressTracker:
             if not feedback.startswith("Waiting"):
                 self.feedback_history.append(feedback)
         
-        # Draw additional visual cues on the frame
-        self.draw_visual_feedback(frame, landmarks, current_elbow_angle, spine_vertical_angle, elbows_forward)
-        
-        # Overlay information on the frame
-        self.draw_info_overlay(frame)
+        if draw:
+            # Draw additional visual cues on the frame
+            self.draw_visual_feedback(frame, landmarks, current_elbow_angle, spine_vertical_angle, elbows_forward, current_time)
+            
+            # Overlay information on the frame
+            self.draw_info_overlay(frame)
         
         return frame, self.last_feedback, self.rep_count, rep_time
     
-    def draw_visual_feedback(self, frame, landmarks, elbow_angle, spine_angle, elbows_forward):
+    def draw_visual_feedback(self, frame, landmarks, elbow_angle, spine_angle, elbows_forward, current_time):
         """Draw visual feedback elements on the frame"""
         h, w, _ = frame.shape
         
@@ -223,7 +220,7 @@ class ShoulderPressTracker:
         
         # Draw rep timing indicator if in a press
         if self.in_press and self.current_rep_start_time:
-            current_duration = time.time() - self.current_rep_start_time
+            current_duration = current_time - self.current_rep_start_time
             # Draw a timer box at the top of the frame
             timer_width = int(min(current_duration * 50, w-40))  # Scale timer width by duration
             cv2.rectangle(frame, (20, 20), (20 + timer_width, 40), (0, 255, 0), -1)
@@ -353,10 +350,8 @@ class ShoulderPressTracker:
         """Draw general information overlay on the frame"""
         h, w, _ = frame.shape
         
-        # Create a semi-transparent overlay for the top info bar
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (w, 100), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # Darken the top info bar
+        darken_info_bar(frame)
         
         # Draw exercise info and rep count
         font = cv2.FONT_HERSHEY_SIMPLEX
@@ -368,7 +363,8 @@ class ShoulderPressTracker:
         # Draw feedback message
         cv2.putText(frame, self.last_feedback, (20, 80), font, 0.7, (255, 255, 255), 2)
         
-    def calculate_vertical_angle(self, a, b):
+    @staticmethod
+    def calculate_vertical_angle(a, b):
         """Calculate the angle between a vector and the vertical axis."""
         dx = b[0] - a[0]
         dy = b[1] - a[1]
@@ -388,5 +384,5 @@ class ShoulderPressTracker:
             "rep_times": self.rep_times,
             "average_rep_time": avg_rep_time,
             "feedback": self.feedback_history,
-            "rep_time_intervals": dict(self.rep_time_intervals)
+            "rep_time_intervals": rep_time_intervals(self.rep_times)
         }
\ No newline at end of file
@@ -0,0 +1,19 @@
+# gunicorn_conf.py
+# Run with: gunicorn -c gunicorn_conf.py main:app
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Threaded workers: /process_frame spends its time in OpenCV/MediaPipe C code, which
+# releases the GIL but cannot yield to an event loop, so each request gets a real OS
+# thread. gevent would run it on the single loop (and, via monkey-patching, turn the
+# TTS and video-writer threads into greenlets), stalling every other request.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# AppManager keeps the active workout session in process memory, so every
+# request has to reach the same worker. Scale with threads, not workers.
+workers = 1
+
+# Give long frames room before the worker is considered hung.
+timeout = 60
@@ -1,7 +1,7 @@
 # main.py
 from flask import Flask, render_template, request, jsonify, send_from_directory, make_response, send_file
 import os
-import json
+import orjson
 import base64
 import numpy as np
 import cv2
@@ -12,6 +12,8 @@ import matplotlib.pyplot as plt
 from io import BytesIO
 from datetime import datetime
 from app.app_manager import AppManager
+from core.uploads import write_upload
+from core.rep_times import rep_time_histogram, merge_histograms, histogram_intervals
 
 app = Flask(__name__)
 app_manager = AppManager()
@@ -131,10 +133,8 @@ def save_session():
         # Update profile
         if exercise in app_manager.profile:
             app_manager.profile[exercise]["latest_reps"] = rep_count
-            app_manager.profile[exercise]["progress"].append(workout_data)
-            
-            with open(app_manager.profile_path, 'w') as f:
-                json.dump(app_manager.profile, f, indent=2)
+            app_manager.add_workout(exercise, workout_data)
+            app_manager.save_profile()
                 
             return jsonify({
                 "status": "success",
@@ -150,6 +150,14 @@ def save_session():
         traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/profile/export', methods=['GET'])
+def export_profile():
+    """Download the user profile as readable JSON"""
+    response = make_response(orjson.dumps(app_manager.get_profile(), option=orjson.OPT_INDENT_2))
+    response.mimetype = 'application/json'
+    response.headers['Content-Disposition'] = 'attachment; filename=user_profile.json'
+    return response
+
 # TheMealDB API integration
 @app.route('/api/recipes/search', methods=['GET'])
 def search_recipes():
@@ -462,25 +470,25 @@ def get_rep_distribution(exercise):
     theme = request.args.get('theme', 'light')
     is_dark = theme == 'dark'
     
-    # Collect all rep times from all workouts
+    # Collect all rep times from the kept workouts, plus the histogram of the
+    # older sessions add_workout folded into progress_stats
+    exercise_data = app_manager.profile[exercise]
     rep_times = []
-    for workout in app_manager.profile[exercise]["progress"]:
+    for workout in exercise_data["progress"]:
         rep_times.extend(workout.get("rep_times", []))
+    interval_counts = merge_histograms(
+        rep_time_histogram(rep_times),
+        exercise_data.get("progress_stats", {}).get("rep_time_counts", []))
         
-    if not rep_times:
+    if not interval_counts.any():
         # Return no-data chart placeholder
         no_data_image = "static/img/no-data-chart-dark.svg" if is_dark else "static/img/no-data-chart.svg"
         if os.path.exists(no_data_image):
             return send_file(no_data_image, mimetype='image/svg+xml')
         return jsonify({"error": "No data available"}), 404
         
-    # Round to nearest 0.5 second
-    rounded_times = [round(t * 2) / 2 for t in rep_times]
-    
-    # Count occurrences
-    time_counts = {}
-    for t in rounded_times:
-        time_counts[t] = time_counts.get(t, 0) + 1
+    # Reps per half-second interval
+    time_counts = histogram_intervals(interval_counts)
         
     # Create chart with improved styling
     plt.figure(figsize=(10, 6))
@@ -539,6 +547,8 @@ def get_progress_history(exercise):
     is_dark = theme == 'dark'
     
     progress = app_manager.profile[exercise]["progress"]
+    # Sessions beyond the kept history only survive as totals in progress_stats
+    folded_sessions = app_manager.profile[exercise].get("progress_stats", {}).get("sessions", 0)
     
     if not progress:
         # Return no-data chart placeholder
@@ -600,7 +610,10 @@ def get_progress_history(exercise):
     # Style the chart
     plt.xlabel('Date', fontsize=12, color=text_color)
     plt.ylabel('Reps Completed', fontsize=12, color=text_color)
-    plt.title(f'Progress Over Time - {exercise}', fontsize=14, fontweight='bold', color=text_color)
+    title = f'Progress Over Time - {exercise}'
+    if folded_sessions:
+        title += f' (last {len(progress)} sessions)'
+    plt.title(title, fontsize=14, fontweight='bold', color=text_color)
     plt.grid(True, linestyle='--', alpha=0.7, color=grid_color)
     plt.xticks(rotation=45, color=text_color)
     plt.yticks(color=text_color)
@@ -635,8 +648,8 @@ def upload_video():
     filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{video_file.filename}"
     filepath = os.path.join('uploads', filename)
     
-    # Save video file
-    video_file.save(filepath)
+    # Save video file in 1MB chunks straight from the request stream
+    write_upload(video_file, filepath)
     
     return jsonify({
         "status": "success",
@@ -100,6 +100,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             });
             
+            // Sessions older than the kept history are summarised in progress_stats
+            const stats = exerciseData.progress_stats;
+            if (stats && stats.best_reps > maxReps) {
+                maxReps = stats.best_reps;
+                bestDate = new Date(stats.best_date);
+            }
+            
             if (bestDate) {
                 bestSession.textContent = `${maxReps} reps on ${formatDate(bestDate)}`;
             } else {